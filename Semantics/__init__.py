@@ -1,3 +1,17 @@
-from .interpreter import Interpreter
+from importlib import import_module
 
-__all__ = ['Interpreter']
+#the backends are only imported on first use, so translated programs importing Semantics.runtime load none of them
+BACKEND_MODULES = {"Interpreter": ".interpreter", "ClosureCompiler": ".closures", "PythonTranslator": ".translator"}
+
+__all__ = ['Interpreter', 'ClosureCompiler', 'PythonTranslator', 'BACKENDS']
+
+def __getattr__(name):
+    if name == "BACKENDS":
+        #what main.py --backend picks from, Interpreter is the reference the others must agree with
+        value = {"interpreter": __getattr__("Interpreter"), "closures": __getattr__("ClosureCompiler"), "python": __getattr__("PythonTranslator")}
+    elif name in BACKEND_MODULES:
+        value = getattr(import_module(BACKEND_MODULES[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
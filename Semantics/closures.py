@@ -0,0 +1,349 @@
+from __future__ import annotations
+import gc
+from typing import Any, Callable, Dict, Iterable, List
+from type_decl.parser_types import *
+from type_decl.lexer_types import TokenType
+from configurables.decl import closure_statement_table, closure_expression_table
+from .interpreter import Interpreter, BINARY_OPERATORS, FunctionReturn, LoopBreak, LoopContinue
+
+
+# Expressions whose value is known at compile time: literal nodes and the raw values assignments unwrap
+LITERAL_TYPES = (IntegerNode, FloatNode, StringNode)
+CONSTANT_TYPES = (int, float, bool)
+
+def nothing() -> None:
+    return None
+
+def flatten(statements: list) -> Iterable[Any]:
+    """The statements of a body without the nesting of its runs"""
+    for stmt in statements:
+        if type(stmt) is list:
+            yield from flatten(stmt)
+        else:
+            yield stmt
+
+class ClosureCompiler(Interpreter):
+    """Backend compiling a ProgramNode once into a tree of closures, one per node, and running that.
+
+    Every closure is built with its children compiled and its operator resolved,
+    so running a program never looks at a node again: compile() once and call
+    the result as often as needed. Results, errors and the environment are the
+    same as Interpreter's, which stays the reference implementation.
+    """
+    #node type -> unbound compile_* method, built once per class like Interpreter.statement_dispatch
+    statement_compile_table = closure_statement_table
+    expression_compile_table = closure_expression_table
+    statement_compilers = {}
+    expression_compilers = {}
+
+    def __init__(self):
+        super().__init__()
+        # id(FunctionNode) -> (node, compiled body), a body is compiled on its function's first call
+        self.functions: Dict[int, tuple] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.statement_compilers = cls.compile_dispatch_table(cls.statement_compile_table)
+        cls.expression_compilers = cls.compile_dispatch_table(cls.expression_compile_table)
+
+    def interpret(self, program: ProgramNode) -> Any:
+        """Compile the program and run it"""
+        return self.compile(program)()
+
+    def interpret_stream(self, statements: Iterable[Any], collect: bool = False) -> Any:
+        """Compile and run statements one at a time as they arrive, like Interpreter.interpret_stream()"""
+        results = [] if collect else None
+        for stmt in statements:
+            result = self.compile_statement(stmt, collect)()
+            if collect and result is not None:
+                results.append(result)
+        return results if results else None
+
+    def compile(self, program: ProgramNode) -> Callable[[], Any]:
+        """The closure running `program` in this compiler's environment, returning what interpret() would"""
+        if not program.Toplevel:
+            return nothing
+        # Compiling only allocates (tens of thousands of closures, no cycles), full collections would just rescan them
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self.compile_statement(program.Toplevel)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def compile_statement(self, stmt: Any, results: bool = True) -> Callable[[], Any]:
+        """Closure running one statement, without `results` its value may be dropped (loop bodies)"""
+        handler = self.statement_compilers.get(type(stmt)) or self.resolve(
+            self.statement_compilers, self.statement_compile_table, type(stmt))
+        if handler is None:
+            # Raised when the statement is reached, like Interpreter does
+            return self.compile_error(ValueError, f"Unknown statement type: {type(stmt)}")
+        return handler(self, stmt, results)
+
+    def compile_expression(self, expr: Any) -> Callable[[], Any]:
+        handler = self.expression_compilers.get(type(expr)) or self.resolve(
+            self.expression_compilers, self.expression_compile_table, type(expr), ClosureCompiler.compile_value)
+        return handler(self, expr)
+
+    def compile_error(self, error: type, message: str) -> Callable[[], Any]:
+        def fail():
+            raise error(message)
+        return fail
+
+    # Statements
+
+    def compile_program(self, program: ProgramNode, results: bool = True) -> Callable[[], Any]:
+        return self.compile(program)
+
+    def compile_block(self, statements: list, results: bool = True) -> Callable[[], Any]:
+        if not results:
+            # Nothing is collected, so the nested runs of a body are run as one flat sequence
+            runs = tuple(self.compile_statement(stmt, False) for stmt in flatten(statements))
+            if not runs:
+                return nothing
+            if len(runs) == 1:
+                return runs[0]
+            def block():
+                for run in runs:
+                    run()
+            return block
+        runs = tuple(self.compile_statement(stmt) for stmt in statements)
+        def block():
+            collected = []
+            for run in runs:
+                result = run()
+                if result is not None:
+                    collected.append(result)
+            return collected if collected else None
+        return block
+
+    def compile_string_statement(self, stmt: str, results: bool = True) -> Callable[[], Any]:
+        if not stmt.startswith("FunctionCall"):
+            return self.compile_error(ValueError, f"Unknown statement type: {type(stmt)}")
+        interpret_function_call_string = self.interpret_function_call_string
+        def call():
+            return interpret_function_call_string(stmt)
+        return call
+
+    def compile_expression_statement(self, stmt: Any, results: bool = True) -> Callable[[], Any]:
+        return self.compile_expression(stmt)
+
+    def compile_assignment(self, stmt: AssignmentNode, results: bool = True) -> Callable[[], Any]:
+        name, env = stmt.lhs, self.environment
+        if isinstance(stmt.rhs, LITERAL_TYPES + CONSTANT_TYPES):
+            value = self.compile_expression(stmt.rhs)()
+            def assign():
+                env[name] = value
+                return value
+            return assign
+        rhs = self.compile_expression(stmt.rhs)
+        def assign():
+            env[name] = value = rhs()
+            return value
+        return assign
+
+    def compile_function_definition(self, stmt: FunctionNode, results: bool = True) -> Callable[[], Any]:
+        # Definitions just bind the name, bodies are compiled when first called
+        env, name = self.environment, stmt.name
+        def define():
+            env[name] = stmt
+        return define
+
+    def compile_if(self, stmt: IfNode, results: bool = True) -> Callable[[], Any]:
+        condition = self.compile_expression(stmt.condition)
+        then_branch = self.compile_statement(stmt.then_branch, results)
+        if not stmt.else_branch:
+            def branch():
+                if condition():
+                    return then_branch()
+                return None
+            return branch
+        else_branch = self.compile_statement(stmt.else_branch, results)
+        def branch():
+            if condition():
+                return then_branch()
+            return else_branch()
+        return branch
+
+    def compile_while(self, stmt: WhileNode, results: bool = True) -> Callable[[], Any]:
+        condition = self.compile_expression(stmt.condition)
+        body = self.compile_statement(stmt.body, False)
+        def loop():
+            while condition():
+                try:
+                    body()
+                except LoopBreak:
+                    break
+                except LoopContinue:
+                    pass
+        return loop
+
+    def compile_for(self, stmt: ForNode, results: bool = True) -> Callable[[], Any]:
+        init = nothing if stmt.init is None else self.compile_statement(stmt.init, False)
+        increment = nothing if stmt.increment is None else self.compile_statement(stmt.increment, False)
+        body = self.compile_statement(stmt.body, False)
+        # A missing condition loops until a break
+        condition = self.compile_expression(stmt.condition) if stmt.condition is not None else (lambda: True)
+        def loop():
+            init()
+            while condition():
+                try:
+                    body()
+                except LoopBreak:
+                    break
+                except LoopContinue:
+                    pass
+                increment()
+        return loop
+
+    def compile_switch(self, stmt: SwitchNode, results: bool = True) -> Callable[[], Any]:
+        expression = self.compile_expression(stmt.expression)
+        cases = tuple((self.compile_expression(case.value), self.compile_statement(case.body, results)) for case in stmt.cases)
+        default = None if stmt.default_case is None else self.compile_statement(stmt.default_case, results)
+        def switch():
+            value = expression()
+            body = default
+            for case, case_body in cases:
+                if case() == value:
+                    body = case_body
+                    break
+            if body is None:
+                return None
+            try:
+                return body()
+            except LoopBreak:
+                return None
+        return switch
+
+    def compile_case(self, stmt: CaseNode, results: bool = True) -> Callable[[], Any]:
+        return self.compile_error(ValueError, "case outside of a switch")
+
+    def compile_return(self, stmt: ReturnNode, results: bool = True) -> Callable[[], Any]:
+        value = nothing if stmt.value is None else self.compile_expression(stmt.value)
+        def return_():
+            raise FunctionReturn(value())
+        return return_
+
+    def compile_break(self, stmt: BreakNode, results: bool = True) -> Callable[[], Any]:
+        def break_():
+            raise LoopBreak()
+        return break_
+
+    def compile_continue(self, stmt: ContinueNode, results: bool = True) -> Callable[[], Any]:
+        def continue_():
+            raise LoopContinue()
+        return continue_
+
+    def compile_goto(self, stmt: GotoNode, results: bool = True) -> Callable[[], Any]:
+        return self.compile_error(ValueError, f"goto {stmt.label}: there are no labels to jump to")
+
+    # Expressions
+
+    def compile_name(self, name: str) -> Callable[[], Any]:
+        # Identifiers are kept as their name: look the variable up, unknown names stay plain strings
+        env = self.environment
+        def variable():
+            return env.get(name, name)
+        return variable
+
+    def compile_constant(self, value: Any) -> Callable[[], Any]:
+        def constant():
+            return value
+        return constant
+
+    def compile_literal(self, expr: Any) -> Callable[[], Any]:
+        return self.compile_constant(expr.value)
+
+    def compile_value(self, expr: Any) -> Callable[[], Any]:
+        # Anything without an entry evaluates to its value (or is a value already)
+        return self.compile_constant(expr.value if hasattr(expr, 'value') else expr)
+
+    def compile_unary(self, expr: UnaryOpNode) -> Callable[[], Any]:
+        operand = self.compile_expression(expr.operand)
+        def negate():
+            return -operand()
+        return negate
+
+    def compile_binary(self, expr: Any) -> Callable[[], Any]:
+        left, right = self.compile_expression(expr.left), self.compile_expression(expr.right)
+        if expr.op == TokenType.DOUBLE_ANPERSAND:
+            # && short-circuits, the right side is only evaluated when needed
+            def both():
+                return left() and right()
+            return both
+        op = BINARY_OPERATORS[expr.op]
+        # The shapes loops and conditions are made of get their operands read inline, without a closure call
+        env = self.environment
+        if isinstance(expr.right, LITERAL_TYPES + CONSTANT_TYPES):
+            value = right()
+            if type(expr.left) is str:
+                name = expr.left
+                def binary():
+                    return op(env.get(name, name), value)
+                return binary
+            def binary():
+                return op(left(), value)
+            return binary
+        if type(expr.left) is str and type(expr.right) is str:
+            left_name, right_name = expr.left, expr.right
+            def binary():
+                return op(env.get(left_name, left_name), env.get(right_name, right_name))
+            return binary
+        def binary():
+            return op(left(), right())
+        return binary
+
+    def compile_call(self, node: FunctionCallNode, results: bool = True) -> Callable[[], Any]:
+        args = tuple(self.compile_expression(arg) for arg in node.args)
+        name, env, call_function = node.name, self.environment, self.call_function
+        if len(args) == 1:
+            arg, = args
+            def call():
+                value = arg()
+                if name in env:
+                    function = env[name]
+                    if isinstance(function, FunctionNode):
+                        return call_function(function, [value])
+                    return function(value)
+                raise NameError(f"Function '{name}' is not defined")
+            return call
+        def call():
+            values = [arg() for arg in args]
+            if name in env:
+                function = env[name]
+                if isinstance(function, FunctionNode):
+                    return call_function(function, values)
+                return function(*values)
+            raise NameError(f"Function '{name}' is not defined")
+        return call
+
+    def call_function(self, function: FunctionNode, args: List[Any]) -> Any:
+        """Interpreter.call_function() running the body compiled, every function is compiled once"""
+        if len(args) != len(function.params):
+            raise TypeError(f"Function '{function.name}' takes {len(function.params)} argument(s) but {len(args)} were given")
+        compiled = self.functions.get(id(function))
+        if compiled is None or compiled[0] is not function:
+            if function.deferred is not None:
+                # Lazily parsed: the body is parsed on the first call and kept on the node from then on
+                function.body, function.deferred = function.deferred.parse(), None
+            compiled = self.functions[id(function)] = (function, self.compile_statement(function.body, False))
+        body = compiled[1]
+        env = self.environment
+        saved = {name: env[name] for name in function.params if name in env}
+        env.update(zip(function.params, args))
+        try:
+            body()
+        except FunctionReturn as returned:
+            return returned.value
+        finally:
+            for name in function.params:
+                if name in saved:
+                    env[name] = saved[name]
+                else:
+                    env.pop(name, None)
+        return None
+
+
+ClosureCompiler.statement_compilers = ClosureCompiler.compile_dispatch_table(ClosureCompiler.statement_compile_table)
+ClosureCompiler.expression_compilers = ClosureCompiler.compile_dispatch_table(ClosureCompiler.expression_compile_table)
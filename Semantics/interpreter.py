@@ -1,22 +1,65 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Union
 from type_decl.parser_types import *
 from type_decl.lexer_types import TokenType
+from configurables.decl import interpreter_statement_table, interpreter_expression_table
+from .runtime import BUILTINS, FunctionReturn, LoopBreak, LoopContinue
 import builtins
+import operator
+
+
+# Evaluation of every binary operator node but && (which short-circuits)
+BINARY_OPERATORS = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MULTIPLY: operator.mul,
+    TokenType.DIVIDE: operator.truediv,
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.EQUAL: operator.eq,
+    TokenType.NOT_EQUAL: operator.ne,
+}
 
 class Interpreter:
+    #node type -> unbound method, built from the name tables in configurables.decl once per class
+    #a subclass extends the language by overriding `statement_table`/`expression_table` (and adding the methods)
+    statement_table = interpreter_statement_table
+    expression_table = interpreter_expression_table
+    statement_dispatch = {}
+    expression_dispatch = {}
+
     def __init__(self):
         self.environment: Dict[str, Any] = {}
         self.setup_builtins()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.statement_dispatch = cls.compile_dispatch_table(cls.statement_table)
+        cls.expression_dispatch = cls.compile_dispatch_table(cls.expression_table)
+
+    @classmethod
+    def compile_dispatch_table(cls, table):
+        """Turn a node type -> method name table into node type -> function"""
+        return {type: getattr(cls, name) for type, name in table.items() if hasattr(cls, name)}
+
+    @classmethod
+    def resolve(cls, dispatch, table, node_type, default=None):
+        """Handler for a type missing from `dispatch`: the one of its nearest base class in `table` (or `default`), cached for next time"""
+        handler = default
+        for base in node_type.__mro__[1:]:
+            if base in table and hasattr(cls, table[base]):
+                handler = getattr(cls, table[base])
+                break
+        if handler is not None:
+            dispatch[node_type] = handler
+        return handler
     
     def setup_builtins(self):
         """Setup built-in functions"""
+        self.environment.update(BUILTINS)
         self.environment['builtin_print'] = self.builtin_print
-        self.environment['builtin_input'] = input
-        self.environment['builtin_len'] = len
-        self.environment['builtin_str'] = str
-        self.environment['builtin_int'] = int
-        self.environment['builtin_float'] = float
     
     def builtin_print(self, *args):
         """Custom print function that handles our types"""
@@ -38,38 +81,74 @@ class Interpreter:
         
         return results if results else None
     
+    def interpret_stream(self, statements: Iterable[Any], collect: bool = False) -> Any:
+        """Run statements as they arrive (e.g. from Parser.iter_statements()), dropping each once it ran.
+
+        Results are only kept with `collect`, which makes the return value
+        match interpret()'s.
+        """
+        results = [] if collect else None
+        for stmt in statements:
+            result = self.interpret_statement(stmt)
+            if collect and result is not None:
+                results.append(result)
+        return results if results else None
+    
     def interpret_statement(self, stmt: Any) -> Any:
-        """Interpret a single statement"""
-        if isinstance(stmt, AssignmentNode):
-            return self.interpret_assignment(stmt)
-        elif isinstance(stmt, IfNode):
-            return self.interpret_if(stmt)
-        elif isinstance(stmt, FunctionCallNode):
-            return self.interpret_function_call(stmt)
-        elif isinstance(stmt, str) and stmt.startswith("FunctionCall"):
-            return self.interpret_function_call_string(stmt)
-        elif isinstance(stmt, list):
-            # Handle nested statement lists
-            results = []
-            for s in stmt:
-                result = self.interpret_statement(s)
-                if result is not None:
-                    results.append(result)
-            return results if results else None
-        else:
+        """Interpret a single statement, one lookup of its type in statement_dispatch"""
+        handler = self.statement_dispatch.get(type(stmt)) or self.resolve(self.statement_dispatch, self.statement_table, type(stmt))
+        if handler is None:
             raise ValueError(f"Unknown statement type: {type(stmt)}")
-    
+        return handler(self, stmt)
+
+    def interpret_program(self, program: ProgramNode) -> Any:
+        return self.interpret(program)
+
+    def interpret_block(self, statements: list) -> Any:
+        """Run a body (a nested list of statements), collecting what they evaluate to"""
+        #dispatched here rather than through interpret_statement: every Python frame spent per
+        #body is one less level of Kyle recursion before the interpreter hits the recursion limit
+        dispatch, results = self.statement_dispatch, []
+        for s in statements:
+            handler = dispatch.get(type(s)) or self.resolve(dispatch, self.statement_table, type(s))
+            if handler is None:
+                raise ValueError(f"Unknown statement type: {type(s)}")
+            result = handler(self, s)
+            if result is not None:
+                results.append(result)
+        return results if results else None
+
+    def interpret_string_statement(self, stmt: str) -> Any:
+        if not stmt.startswith("FunctionCall"):
+            raise ValueError(f"Unknown statement type: {type(stmt)}")
+        return self.interpret_function_call_string(stmt)
+
+    def interpret_function_definition(self, stmt: FunctionNode) -> None:
+        # Definitions just bind the name, bodies only run when called
+        self.environment[stmt.name] = stmt
+
+    def interpret_return(self, stmt: ReturnNode) -> Any:
+        raise FunctionReturn(None if stmt.value is None else self.interpret_expression(stmt.value))
+
+    def interpret_break(self, stmt: BreakNode) -> Any:
+        raise LoopBreak()
+
+    def interpret_continue(self, stmt: ContinueNode) -> Any:
+        raise LoopContinue()
+
+    def interpret_goto(self, stmt: GotoNode) -> Any:
+        raise ValueError(f"goto {stmt.label}: there are no labels to jump to")
+
+    def interpret_case(self, stmt: CaseNode) -> Any:
+        raise ValueError("case outside of a switch")
+
     def interpret_assignment(self, stmt: AssignmentNode) -> Any:
         """Interpret assignment statement"""
-        # Extract variable name from the token
-        var_name = stmt.lhs.value if hasattr(stmt.lhs, 'value') else str(stmt.lhs)
-        var_name = var_name.replace("Token(TokenType.IDENTIFIER, '", "").replace("')", "")
-        
         # Interpret the right-hand side
         value = self.interpret_expression(stmt.rhs)
         
         # Store in environment
-        self.environment[var_name] = value
+        self.environment[stmt.lhs] = value
         
         return value
     
@@ -80,83 +159,84 @@ class Interpreter:
         
         if condition_result:
             # Execute then branch
-            return self.interpret_statement(stmt.then_branch)
+            return self.interpret_block(stmt.then_branch)
         elif stmt.else_branch:
             # Execute else branch
-            return self.interpret_statement(stmt.else_branch)
+            return self.interpret_block(stmt.else_branch)
         
         return None
     
-    def interpret_condition(self, condition: str) -> bool:
+    def interpret_while(self, stmt: WhileNode) -> None:
+        while self.interpret_condition(stmt.condition):
+            try:
+                self.interpret_block(stmt.body)
+            except LoopBreak:
+                break
+            except LoopContinue:
+                pass
+
+    def interpret_for(self, stmt: ForNode) -> None:
+        # Every clause is optional, a missing condition loops until a break
+        if stmt.init is not None:
+            self.interpret_statement(stmt.init)
+        while stmt.condition is None or self.interpret_condition(stmt.condition):
+            try:
+                self.interpret_block(stmt.body)
+            except LoopBreak:
+                break
+            except LoopContinue:
+                pass
+            if stmt.increment is not None:
+                self.interpret_statement(stmt.increment)
+
+    def interpret_switch(self, stmt: SwitchNode) -> Any:
+        """Run the body of the first case equal to the switch expression (or the default), there is no fallthrough"""
+        value = self.interpret_expression(stmt.expression)
+        body = stmt.default_case
+        for case in stmt.cases:
+            if self.interpret_expression(case.value) == value:
+                body = case.body
+                break
+        if body is None:
+            return None
+        try:
+            return self.interpret_block(body)
+        except LoopBreak:
+            return None
+
+    def interpret_condition(self, condition: Any) -> bool:
         """Interpret condition expression"""
-        if condition.startswith("Comparison"):
-            # Parse comparison like "Comparison(age >= IntegerNode(value='18'))"
-            # Extract left operand, operator, and right operand
-            import re
-            match = re.match(r"Comparison\(([^ ]+) ([^ ]+) (.+)\)", condition)
-            if match:
-                left, op, right = match.groups()
-                
-                # Evaluate left operand
-                left_val = self.interpret_expression(left)
-                
-                # Evaluate right operand
-                right_val = self.interpret_expression(right)
-                
-                # Perform comparison
-                if op == ">=":
-                    return left_val >= right_val
-                elif op == "<=":
-                    return left_val <= right_val
-                elif op == ">":
-                    return left_val > right_val
-                elif op == "<":
-                    return left_val < right_val
-                elif op == "==":
-                    return left_val == right_val
-                elif op == "!=":
-                    return left_val != right_val
-                else:
-                    raise ValueError(f"Unknown comparison operator: {op}")
-        
-        # Simple boolean expression
+        # Conditions are expression nodes (e.g. CompareNode), evaluated directly
         return bool(self.interpret_expression(condition))
     
     def interpret_expression(self, expr: Any) -> Any:
-        """Interpret expression"""
-        if isinstance(expr, str):
-            # Check if it's a variable name
-            if expr in self.environment:
-                return self.environment[expr]
-            # Check if it's a string literal
-            elif expr.startswith('"') and expr.endswith('"'):
-                return expr[1:-1]  # Remove quotes
-            # Check if it's an IntegerNode representation
-            elif expr.startswith("IntegerNode"):
-                import re
-                match = re.search(r"value='(\d+)'", expr)
-                if match:
-                    return int(match.group(1))
-            # Check if it's a StringNode representation
-            elif expr.startswith("StringNode"):
-                import re
-                match = re.search(r"value='([^']*)'", expr)
-                if match:
-                    return match.group(1)
-            # Check if it's a FloatNode representation
-            elif expr.startswith("FloatNode"):
-                import re
-                match = re.search(r"value='([\d.]+)'", expr)
-                if match:
-                    return float(match.group(1))
-            else:
-                # Return the string as-is for variable names
-                return expr
-        elif hasattr(expr, 'value'):
-            # Handle AST nodes like IntegerNode, StringNode
-            return expr.value
-        else:
-            return expr
+        """Interpret expression, one lookup of its type in expression_dispatch"""
+        handler = self.expression_dispatch.get(type(expr)) or self.resolve(
+            self.expression_dispatch, self.expression_table, type(expr), Interpreter.evaluate_value)
+        return handler(self, expr)
+
+    def evaluate_name(self, name: str) -> Any:
+        # Identifiers are kept as their name: look the variable up, unknown names stay plain strings
+        return self.environment.get(name, name)
+
+    def evaluate_binary(self, expr: Union[BinaryOpNode, CompareNode]) -> Any:
+        if expr.op == TokenType.DOUBLE_ANPERSAND:
+            # && short-circuits, the right side is only evaluated when needed
+            return self.interpret_expression(expr.left) and self.interpret_expression(expr.right)
+        return BINARY_OPERATORS[expr.op](self.interpret_expression(expr.left), self.interpret_expression(expr.right))
+
+    def evaluate_unary(self, expr: UnaryOpNode) -> Any:
+        return -self.interpret_expression(expr.operand)
+
+    def evaluate_literal(self, expr: Union[IntegerNode, FloatNode, StringNode]) -> Any:
+        return expr.value
+
+    def evaluate_constant(self, value: Any) -> Any:
+        return value
+
+    def evaluate_value(self, expr: Any) -> Any:
+        # Anything without an entry evaluates to its value (or is a value already)
+        return expr.value if hasattr(expr, 'value') else expr
 
     def interpret_function_call(self, call_node: FunctionCallNode) -> Any:
         """Interpret function call from AST node"""
@@ -178,10 +258,34 @@ class Interpreter:
         
         # Call the function
         if call_node.name in self.environment:
-            return self.environment[call_node.name](*args)
+            function = self.environment[call_node.name]
+            if isinstance(function, FunctionNode):
+                return self.call_function(function, args)
+            return function(*args)
         else:
             raise NameError(f"Function '{call_node.name}' is not defined")
 
+    def call_function(self, function: FunctionNode, args: List[Any]) -> Any:
+        """Run a user-defined function, its parameters shadow same-named variables for the duration of the call"""
+        if len(args) != len(function.params):
+            raise TypeError(f"Function '{function.name}' takes {len(function.params)} argument(s) but {len(args)} were given")
+        if function.deferred is not None:
+            # Lazily parsed: the body is parsed on the first call and kept on the node from then on
+            function.body, function.deferred = function.deferred.parse(), None
+        saved = {name: self.environment[name] for name in function.params if name in self.environment}
+        self.environment.update(zip(function.params, args))
+        try:
+            self.interpret_block(function.body)
+        except FunctionReturn as returned:
+            return returned.value
+        finally:
+            for name in function.params:
+                if name in saved:
+                    self.environment[name] = saved[name]
+                else:
+                    self.environment.pop(name, None)
+        return None
+
     def interpret_function_call_string(self, call_str: str) -> Any:
         """Interpret function call from string representation"""
         # Parse function call like "FunctionCall(builtin_print, args=[StringNode(value='You are an adult')])"
@@ -215,3 +319,7 @@ class Interpreter:
                 raise NameError(f"Function '{func_name}' is not defined")
         
         return None
+
+
+Interpreter.statement_dispatch = Interpreter.compile_dispatch_table(Interpreter.statement_table)
+Interpreter.expression_dispatch = Interpreter.compile_dispatch_table(Interpreter.expression_table)
@@ -0,0 +1,66 @@
+"""
+Runtime of translated programs (see Semantics.translator), the only thing a module written by `main.py --aot` imports.
+
+Nothing else from the compiler is imported here, so running translated code
+never loads the lexer, the parser or any of the backends.
+"""
+from typing import Any, Callable, Dict
+
+
+class FunctionReturn(Exception):
+    """Unwinds a user-defined function's body up to its call on `return`/`bailout`"""
+    def __init__(self, value=None):
+        self.value = value
+
+class LoopBreak(Exception):
+    """Unwinds a loop (or switch) body on `break`"""
+
+class LoopContinue(Exception):
+    """Unwinds a loop body up to its next iteration on `continue`"""
+
+
+def builtin_print(*args):
+    print(" ".join(str(arg) for arg in args))
+
+# What every program's environment starts with (Interpreter binds its own overridable print over builtin_print)
+BUILTINS = {
+    'builtin_print': builtin_print,
+    'builtin_input': input,
+    'builtin_len': len,
+    'builtin_str': str,
+    'builtin_int': int,
+    'builtin_float': float,
+}
+
+
+class Environment(dict):
+    """The variables of a translated program, identifiers that were never assigned read as their own name"""
+    def __missing__(self, name):
+        return name
+
+def new_environment() -> Environment:
+    return Environment(BUILTINS)
+
+def undefined(name: str) -> Callable:
+    raise NameError(f"Function '{name}' is not defined")
+
+def arity_error(name: str, params: int, given: int) -> TypeError:
+    return TypeError(f"Function '{name}' takes {params} argument(s) but {given} were given")
+
+def save_arguments(env: Dict[str, Any], params: tuple) -> Dict[str, Any]:
+    # Parameters shadow same-named variables for the duration of a call, like Interpreter.call_function()
+    return {name: env[name] for name in params if name in env}
+
+def restore_arguments(env: Dict[str, Any], params: tuple, saved: Dict[str, Any]) -> None:
+    for name in params:
+        if name in saved:
+            env[name] = saved[name]
+        else:
+            env.pop(name, None)
+
+def call_string(env: Dict[str, Any], text: str) -> Any:
+    # The old "FunctionCall(...)" statement form, only ever found in hand-built trees: the interpreter is loaded for it alone
+    from .interpreter import Interpreter
+    interpreter = Interpreter.__new__(Interpreter)
+    interpreter.environment = env
+    return interpreter.interpret_function_call_string(text)
@@ -0,0 +1,511 @@
+from __future__ import annotations
+import ast
+import gc
+import os
+import re
+import py_compile
+from typing import Any, Callable, Dict, Iterable, List
+from type_decl.parser_types import *
+from type_decl.lexer_types import TokenType
+from configurables.decl import COMPILER_VERSION, translator_statement_table, translator_expression_table
+from .interpreter import Interpreter
+from .runtime import Environment
+
+
+# Python operator every binary operator node lowers to, && becomes an `and`
+PYTHON_OPERATORS = {
+    TokenType.PLUS: ast.Add,
+    TokenType.MINUS: ast.Sub,
+    TokenType.MULTIPLY: ast.Mult,
+    TokenType.DIVIDE: ast.Div,
+}
+PYTHON_COMPARISONS = {
+    TokenType.GREATER: ast.Gt,
+    TokenType.LESS: ast.Lt,
+    TokenType.GREATER_EQUAL: ast.GtE,
+    TokenType.LESS_EQUAL: ast.LtE,
+    TokenType.EQUAL: ast.Eq,
+    TokenType.NOT_EQUAL: ast.NotEq,
+}
+
+# What translated modules import from Semantics.runtime, the runtime they need besides the builtins
+RUNTIME = ("Environment", "new_environment", "undefined", "arity_error", "save_arguments", "restore_arguments",
+           "call_string", "FunctionReturn", "LoopBreak", "LoopContinue")
+# Most statements interpret_stream() compiles at once
+STREAM_BATCH = 1024
+# CPython refuses to compile more statically nested blocks (loops, try) than this in one function
+MAX_BLOCKS = 20
+HEADER = "# Translated from {source} by Shitpiler {version}, do not edit: regenerate it from the .kyle source instead\n"
+
+
+# Python AST shorthands, contexts carry no state so every node shares the same two (as ast.parse() does)
+LOAD, STORE = ast.Load(), ast.Store()
+
+def load(name: str) -> ast.Name:
+    return ast.Name(name, LOAD)
+
+def store(name: str) -> ast.Name:
+    return ast.Name(name, STORE)
+
+def call(function: ast.expr, *args: ast.expr) -> ast.Call:
+    return ast.Call(function, list(args), [])
+
+def variable(name: str, context=LOAD) -> ast.Subscript:
+    return ast.Subscript(load("env"), ast.Constant(name), context)
+
+def collect(target: str, value: ast.expr) -> ast.stmt:
+    return ast.Expr(call(ast.Attribute(load(target), "append", LOAD), value))
+
+def catch(error: str, *body: ast.stmt) -> ast.ExceptHandler:
+    return ast.ExceptHandler(load(error), None, list(body) or [ast.Pass()])
+
+def fail(error: str, message: str) -> ast.stmt:
+    return ast.Raise(call(load(error), ast.Constant(message)), None)
+
+def locate(tree: ast.AST) -> ast.AST:
+    """ast.fix_missing_locations() for trees built without any position: everything goes on line 1, without recursion"""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node._attributes:
+            node.lineno = node.end_lineno = 1
+            node.col_offset = node.end_col_offset = 0
+        for name in node._fields:
+            value = getattr(node, name, None)
+            if type(value) is list:
+                stack.extend(value) #the translator only ever puts nodes in lists
+            elif isinstance(value, ast.AST):
+                stack.append(value)
+    return tree
+
+def module_name(filename: str) -> str:
+    """An importable module name for a .kyle file: its base name with everything not allowed in identifiers replaced"""
+    name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(filename))[0])
+    return name if name and not name[0].isdigit() else "_" + name
+
+
+class PythonTranslator(Interpreter):
+    """Backend lowering a ProgramNode to a Python module (ast.Module) and running its code object.
+
+    The module defines run(env=None), which executes the program at CPython
+    bytecode speed and returns what Interpreter.interpret() would. Variables
+    stay entries of one Environment, so names keep Kyle's rules (dynamic
+    scope, unknown names read as strings); loops, branches, returns, break
+    and continue become the native Python statements, only the jumps a
+    called function raises are caught (around the call, see catch_jumps()).
+    write_module() saves the module as an importable .py (and .pyc).
+    Unlike Interpreter, a call looks its function up before evaluating the
+    arguments, and lazy bodies are parsed when translated rather than when
+    first called.
+    """
+    #node type -> unbound lower_* method, built once per class like Interpreter.statement_dispatch
+    statement_lowering_table = translator_statement_table
+    expression_lowering_table = translator_expression_table
+    statement_lowerers = {}
+    expression_lowerers = {}
+
+    def __init__(self, filename: str = "<kyle>"):
+        super().__init__()
+        self.environment = Environment(self.environment)
+        self.filename = filename #what tracebacks through translated code name as their file
+        self.on_statement = None #called before every statement when set (see util.metrics), never in written modules
+        #enclosing [kind, continued] of the function being lowered, innermost last: 'while'/'for' loops
+        #(continued once something in them continues natively), 'switch' and the 'clause' of a for increment
+        self.jumps: List[list] = []
+        self.in_function = False
+        self.hoisted = False #lowering a loop moved into a function of its own, see hoist()
+        self.depth = 0 #Python blocks around the statements being lowered, in the function they end up in
+        self.raises = False #whether the statement being lowered calls something no catch_jumps() covers yet
+        self.temporaries = 0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.statement_lowerers = cls.compile_dispatch_table(cls.statement_lowering_table)
+        cls.expression_lowerers = cls.compile_dispatch_table(cls.expression_lowering_table)
+
+    def interpret(self, program: ProgramNode) -> Any:
+        """Translate and compile the program, then run it in this translator's environment"""
+        return self.load(self.compile(program))(self.environment)
+
+    def interpret_stream(self, statements: Iterable[Any], collect: bool = False) -> Any:
+        """Translate and run statements as they arrive, like Interpreter.interpret_stream().
+
+        One compile() costs far more than running a statement, so they are
+        compiled in batches, from a single statement (output starts at once)
+        doubling up to STREAM_BATCH. A batch runs when it is full, when the
+        stream ends, or before a syntax error further on is raised.
+        """
+        results = [] if collect else None
+        batch, size = [], 1
+        def run_batch():
+            result = self.load(self.compile(ProgramNode(Toplevel=batch)))(self.environment)
+            if collect and result is not None:
+                results.extend(result)
+        try:
+            for stmt in statements:
+                batch.append(stmt)
+                if len(batch) >= size:
+                    run_batch()
+                    batch, size = [], min(size * 2, STREAM_BATCH)
+        except Exception:
+            if batch:
+                run_batch()
+            raise
+        if batch:
+            run_batch()
+        return results if results else None
+
+    def translate(self, program: ProgramNode) -> ast.Module:
+        """The Python module running `program`: runtime imports, run(env=None), and a __main__ guard printing its result"""
+        self.jumps, self.in_function, self.hoisted, self.depth, self.raises, self.temporaries = [], False, False, 0, False, 0
+        body = [
+            ast.If(ast.Compare(load("env"), [ast.Is()], [ast.Constant(None)]),
+                   [ast.Assign([store("env")], call(load("new_environment")))], []),
+            ast.Assign([store("results")], ast.List([], LOAD)),
+            *self.lower_statements(program.Toplevel or [], "results"),
+            ast.Return(ast.IfExp(load("results"), load("results"), ast.Constant(None))),
+        ]
+        arguments = ast.arguments([], [ast.arg("env")], None, [], [], None, [ast.Constant(None)])
+        module = ast.Module([
+            ast.ImportFrom("Semantics.runtime", [ast.alias(name) for name in RUNTIME], 0),
+            ast.FunctionDef("run", arguments, body, [], None, None, []),
+            ast.If(ast.Compare(load("__name__"), [ast.Eq()], [ast.Constant("__main__")]),
+                   [ast.Expr(call(load("print"), call(load("run"))))], []),
+        ], [])
+        return locate(module)
+
+    def compile(self, program: ProgramNode) -> Any:
+        """The code object of the translated module"""
+        # Only allocates (a Python AST several times the size of the Kyle one, no cycles), full collections would just rescan it
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return compile(self.translate(program), self.filename, "exec")
+        finally:
+            if enabled:
+                gc.enable()
+
+    def load(self, code: Any) -> Callable[[Dict[str, Any]], Any]:
+        """Execute a translated module's code and return its run() function"""
+        namespace = {"__name__": module_name(self.filename)}
+        if self.on_statement is not None:
+            namespace["on_statement"] = self.on_statement
+        exec(code, namespace)
+        return namespace["run"]
+
+    def write_module(self, program: ProgramNode, path: str, source: str = None, bytecode: bool = True) -> str:
+        """Write `program` as the importable module `path` (and its __pycache__ .pyc with `bytecode`), returns the path"""
+        hook, self.on_statement = self.on_statement, None
+        try:
+            text = HEADER.format(source=source or self.filename, version=COMPILER_VERSION) + ast.unparse(self.translate(program)) + "\n"
+        finally:
+            self.on_statement = hook
+        with open(path, "w") as f:
+            f.write(text)
+        if bytecode:
+            py_compile.compile(path, doraise=True)
+        return path
+
+    # Statements
+
+    def lower_statement(self, stmt: Any, target: str = None) -> List[ast.stmt]:
+        """Python statements running `stmt`, appending its value to the list `target` (None drops it)"""
+        handler = self.statement_lowerers.get(type(stmt)) or self.resolve(
+            self.statement_lowerers, self.statement_lowering_table, type(stmt))
+        raises, self.raises = self.raises, False
+        if handler is None:
+            # Raised when the statement is reached, like Interpreter does
+            lowered = [fail("ValueError", f"Unknown statement type: {type(stmt)}")]
+        else:
+            lowered = handler(self, stmt, target)
+        if self.raises and not isinstance(stmt, list):
+            lowered = self.catch_jumps(lowered)
+        self.raises = self.raises or raises
+        if self.on_statement is not None and not isinstance(stmt, list):
+            lowered.insert(0, ast.Expr(call(load("on_statement"))))
+        return lowered
+
+    def lower_statements(self, statements: list, target: str = None) -> List[ast.stmt]:
+        lowered = []
+        for stmt in statements:
+            lowered.extend(self.lower_statement(stmt, target))
+        return lowered
+
+    def lower_value(self, value: ast.expr, target: str = None) -> List[ast.stmt]:
+        """Evaluate `value` as a statement, collecting it unless it is None"""
+        if target is None:
+            return [ast.Expr(value)]
+        if isinstance(value, ast.Constant):
+            return [collect(target, value)] if value.value is not None else []
+        return [ast.Assign([store("value")], value),
+                ast.If(ast.Compare(load("value"), [ast.IsNot()], [ast.Constant(None)]), [collect(target, load("value"))], [])]
+
+    def jump_handlers(self) -> List[ast.ExceptHandler]:
+        """Handlers making the jump Interpreter makes when a called function raises LoopBreak/LoopContinue here, none where they go on up"""
+        jumps = self.jumps
+        if not jumps or jumps[-1][0] == "clause":
+            return []
+        if jumps[-1][0] != "switch":
+            jumps[-1][1] = True
+            return [catch("LoopBreak", ast.Break()), catch("LoopContinue", ast.Continue())]
+        # The switch itself catches LoopBreak, LoopContinue goes on to the loop around it
+        loop = self.innermost_loop()
+        if loop is None:
+            return []
+        loop[1] = True
+        return [catch("LoopContinue", ast.Continue())]
+
+    def catch_jumps(self, lowered: List[ast.stmt]) -> List[ast.stmt]:
+        """`lowered` (which calls functions) in a try making the jumps they raise natively, where there is a loop to jump in"""
+        handlers = self.jump_handlers()
+        if not handlers:
+            return lowered
+        self.raises = False
+        return [ast.Try(lowered, handlers, [], [])]
+
+    def guard(self, value: ast.expr, prefix: str) -> tuple:
+        """Statements computing `value` into a temporary through catch_jumps() when it calls functions, and what reads it.
+
+        Conditions go through it so the try (a block of its own) only ever
+        holds the condition, never the branches and loops under it.
+        """
+        if not self.raises or not self.jump_handlers():
+            return [], value
+        name = self.temporary(prefix)
+        return self.catch_jumps([ast.Assign([store(name)], value)]), load(name)
+
+    def innermost_loop(self) -> list:
+        return next((jump for jump in reversed(self.jumps) if jump[0] in ("while", "for")), None)
+
+    def temporary(self, prefix: str) -> str:
+        self.temporaries += 1
+        return f"{prefix}_{self.temporaries}"
+
+    def lower_program(self, program: ProgramNode, target: str = None) -> List[ast.stmt]:
+        return self.lower_block(program.Toplevel or [], target)
+
+    def lower_block(self, statements: list, target: str = None) -> List[ast.stmt]:
+        if target is None:
+            return self.lower_statements(statements)
+        # A body's results are its own list, only collected when something went into it
+        block = self.temporary("block")
+        return [ast.Assign([store(block)], ast.List([], LOAD)),
+                *self.lower_statements(statements, block),
+                ast.If(load(block), [collect(target, load(block))], [])]
+
+    def lower_string_statement(self, stmt: str, target: str = None) -> List[ast.stmt]:
+        if not stmt.startswith("FunctionCall"):
+            return [fail("ValueError", f"Unknown statement type: {type(stmt)}")]
+        self.raises = True
+        return self.lower_value(call(load("call_string"), load("env"), ast.Constant(stmt)), target)
+
+    def lower_expression_statement(self, stmt: Any, target: str = None) -> List[ast.stmt]:
+        return self.lower_value(self.lower_expression(stmt), target)
+
+    def lower_assignment(self, stmt: AssignmentNode, target: str = None) -> List[ast.stmt]:
+        name, value = stmt.lhs, self.lower_expression(stmt.rhs)
+        if target is None or isinstance(value, ast.Constant):
+            lowered = [ast.Assign([variable(name, STORE)], value)]
+            if target is not None and value.value is not None:
+                lowered.append(collect(target, value))
+            return lowered
+        return [ast.Assign([store("value"), variable(name, STORE)], value),
+                ast.If(ast.Compare(load("value"), [ast.IsNot()], [ast.Constant(None)]), [collect(target, load("value"))], [])]
+
+    def lower_function_definition(self, stmt: FunctionNode, target: str = None) -> List[ast.stmt]:
+        """A Python function taking the arguments, they are bound in the environment around the body"""
+        if stmt.deferred is not None:
+            # A whole program is translated at once, lazily parsed bodies are parsed now
+            stmt.body, stmt.deferred = stmt.deferred.parse(), None
+        params = tuple(stmt.params)
+        saved = self.jumps, self.in_function, self.hoisted, self.depth, self.raises
+        # Bodies with parameters run inside the try restoring them
+        self.jumps, self.in_function, self.hoisted, self.depth = [], True, False, 1 if params else 0
+        try:
+            body = self.lower_statements(stmt.body or [])
+        finally:
+            # Defining a function calls nothing, what its body raises is caught where it gets called
+            self.jumps, self.in_function, self.hoisted, self.depth, self.raises = saved
+        arity = ast.If(ast.Compare(call(load("len"), load("args")), [ast.NotEq()], [ast.Constant(len(params))]),
+                       [ast.Raise(call(load("arity_error"), ast.Constant(stmt.name), ast.Constant(len(params)),
+                                       call(load("len"), load("args"))), None)], [])
+        if params:
+            bind = [ast.Assign([variable(name, STORE)], ast.Subscript(load("args"), ast.Constant(index), LOAD))
+                    for index, name in enumerate(params)]
+            body = [ast.Assign([store("saved")], call(load("save_arguments"), load("env"), ast.Constant(params))),
+                    *bind,
+                    ast.Try(body or [ast.Pass()], [], [],
+                            [ast.Expr(call(load("restore_arguments"), load("env"), ast.Constant(params), load("saved")))])]
+        name = f"kyle_{stmt.name}"
+        arguments = ast.arguments([], [], ast.arg("args"), [], [], None, [])
+        return [ast.FunctionDef(name, arguments, [arity, *body], [], None, None, []),
+                ast.Assign([variable(stmt.name, STORE)], load(name))]
+
+    def lower_if(self, stmt: IfNode, target: str = None) -> List[ast.stmt]:
+        guard, condition = self.guard(self.lower_expression(stmt.condition), "test")
+        then_branch = self.lower_statement(stmt.then_branch, target)
+        else_branch = self.lower_statement(stmt.else_branch, target) if stmt.else_branch else []
+        return [*guard, ast.If(condition, then_branch or [ast.Pass()], else_branch)]
+
+    def hoist(self, lower: Callable[[], List[ast.stmt]]) -> List[ast.stmt]:
+        """The loop `lower` lowers, moved into a function of its own that is called in its place.
+
+        Kyle loops nest deeper than CPython compiles in one function
+        (MAX_BLOCKS), the new function starts from no blocks again. Every
+        break and continue stays inside the loop; a return hands its value
+        out in a tuple, passed on up to the Kyle function's own return.
+        """
+        name = self.temporary("loop")
+        saved = self.hoisted, self.depth
+        self.hoisted, self.depth = True, 0
+        try:
+            body = lower()
+        finally:
+            self.hoisted, self.depth = saved
+        definition = ast.FunctionDef(name, ast.arguments([], [], None, [], [], None, []), body, [], None, None, [])
+        if not self.in_function:
+            return [definition, ast.Expr(call(load(name)))]
+        returned = self.temporary("returned")
+        value = load(returned) if self.hoisted else ast.Subscript(load(returned), ast.Constant(0), LOAD)
+        return [definition, ast.Assign([store(returned)], call(load(name))),
+                ast.If(ast.Compare(load(returned), [ast.IsNot()], [ast.Constant(None)]), [ast.Return(value)], [])]
+
+    def lower_loop_body(self, jump: list, body: Any) -> List[ast.stmt]:
+        """A loop body, break and continue in it become the native statements"""
+        # One block for the loop, one more for the try catch_jumps() puts around it when its clauses call functions
+        depth, self.depth = self.depth, self.depth + 1 + self.raises
+        self.jumps.append(jump)
+        try:
+            return self.lower_statement(body)
+        finally:
+            self.jumps.pop()
+            self.depth = depth
+
+    def lower_clause(self, stmt: Any) -> List[ast.stmt]:
+        # A for increment runs inside the loop, but what it raises goes on to the loop around the for
+        self.jumps.append(["clause", False])
+        try:
+            return self.lower_statement(stmt)
+        finally:
+            self.jumps.pop()
+
+    def lower_while(self, stmt: WhileNode, target: str = None) -> List[ast.stmt]:
+        # Room for the loop, the try around it, a switch and the try around a call in it
+        if self.depth + 4 > MAX_BLOCKS:
+            return self.hoist(lambda: self.lower_while(stmt))
+        condition = self.lower_expression(stmt.condition)
+        return [ast.While(condition, self.lower_loop_body(["while", False], stmt.body) or [ast.Pass()], [])]
+
+    def lower_for(self, stmt: ForNode, target: str = None) -> List[ast.stmt]:
+        """A while loop running the increment after the body, or at the top of every pass but the
+        first when something in the body continues it, so a native continue still runs it"""
+        if self.depth + 4 > MAX_BLOCKS:
+            return self.hoist(lambda: self.lower_for(stmt))
+        init = [] if stmt.init is None else self.lower_statement(stmt.init)
+        # A missing condition loops until a break
+        condition = ast.Constant(True) if stmt.condition is None else self.lower_expression(stmt.condition)
+        increment = [] if stmt.increment is None else self.lower_clause(stmt.increment)
+        loop = ["for", False]
+        body = self.lower_loop_body(loop, stmt.body)
+        if not (loop[1] and increment):
+            return [*init, ast.While(condition, [*body, *increment] or [ast.Pass()], [])]
+        skip = self.temporary("skip")
+        test = [] if stmt.condition is None else [ast.If(ast.UnaryOp(ast.Not(), condition), [ast.Break()], [])]
+        return [*init, ast.Assign([store(skip)], ast.Constant(True)),
+                ast.While(ast.Constant(True), [ast.If(load(skip), [ast.Assign([store(skip)], ast.Constant(False))], increment),
+                                               *test, *body], [])]
+
+    def lower_switch(self, stmt: SwitchNode, target: str = None) -> List[ast.stmt]:
+        """An if/elif chain over the cases in order, no fallthrough; break leaves it through LoopBreak"""
+        value = self.temporary("switch")
+        lowered = [ast.Assign([store(value)], self.lower_expression(stmt.expression))]
+        if self.raises:
+            lowered = self.catch_jumps(lowered)
+        values = [self.lower_expression(case.value) for case in stmt.cases]
+        depth, self.depth = self.depth, self.depth + 1 + self.raises
+        self.jumps.append(["switch", False])
+        try:
+            bodies = [self.lower_statement(case.body, target) for case in stmt.cases]
+            chain = [] if stmt.default_case is None else self.lower_statement(stmt.default_case, target)
+        finally:
+            self.jumps.pop()
+            self.depth = depth
+        for case, body in reversed(list(zip(values, bodies))):
+            chain = [ast.If(ast.Compare(case, [ast.Eq()], [load(value)]), body or [ast.Pass()], chain)]
+        if chain:
+            lowered.append(ast.Try(chain, [catch("LoopBreak")], [], []))
+        return lowered
+
+    def lower_case(self, stmt: CaseNode, target: str = None) -> List[ast.stmt]:
+        return [fail("ValueError", "case outside of a switch")]
+
+    def lower_return(self, stmt: ReturnNode, target: str = None) -> List[ast.stmt]:
+        value = ast.Constant(None) if stmt.value is None else self.lower_expression(stmt.value)
+        if self.in_function:
+            # Out of a hoisted loop the value goes in a tuple, see hoist()
+            return [ast.Return(ast.Tuple([value], LOAD) if self.hoisted else value)]
+        # Outside of any function the return escapes the program, as it does from Interpreter
+        return [ast.Raise(call(load("FunctionReturn"), value), None)]
+
+    def lower_break(self, stmt: BreakNode, target: str = None) -> List[ast.stmt]:
+        if self.jumps and self.jumps[-1][0] != "switch":
+            return [ast.Break()]
+        # Leaving a switch, or (outside of any loop) the loop around the call of this function
+        return [ast.Raise(call(load("LoopBreak")), None)]
+
+    def lower_continue(self, stmt: ContinueNode, target: str = None) -> List[ast.stmt]:
+        loop = self.innermost_loop()
+        if loop is None:
+            # Continues the loop around the call of this function
+            return [ast.Raise(call(load("LoopContinue")), None)]
+        loop[1] = True
+        return [ast.Continue()]
+
+    def lower_goto(self, stmt: GotoNode, target: str = None) -> List[ast.stmt]:
+        return [fail("ValueError", f"goto {stmt.label}: there are no labels to jump to")]
+
+    # Expressions
+
+    def lower_expression(self, expr: Any) -> ast.expr:
+        handler = self.expression_lowerers.get(type(expr)) or self.resolve(
+            self.expression_lowerers, self.expression_lowering_table, type(expr), PythonTranslator.lower_value_of)
+        return handler(self, expr)
+
+    def lower_name(self, name: str) -> ast.expr:
+        # Identifiers are kept as their name, the Environment reads unknown ones as plain strings
+        return variable(name)
+
+    def lower_constant(self, value: Any) -> ast.expr:
+        return ast.Constant(value)
+
+    def lower_literal(self, expr: Any) -> ast.expr:
+        return ast.Constant(expr.value)
+
+    def lower_value_of(self, expr: Any) -> ast.expr:
+        # Anything without an entry evaluates to its value (or is a value already)
+        value = expr.value if hasattr(expr, 'value') else expr
+        if value is not None and not isinstance(value, (str, int, float, bool)):
+            raise TypeError(f"Cannot translate {type(value).__name__} values to Python")
+        return ast.Constant(value)
+
+    def lower_unary(self, expr: UnaryOpNode) -> ast.expr:
+        return ast.UnaryOp(ast.USub(), self.lower_expression(expr.operand))
+
+    def lower_binary(self, expr: Any) -> ast.expr:
+        left, right = self.lower_expression(expr.left), self.lower_expression(expr.right)
+        if expr.op == TokenType.DOUBLE_ANPERSAND:
+            return ast.BoolOp(ast.And(), [left, right])
+        if expr.op in PYTHON_COMPARISONS:
+            return ast.Compare(left, [PYTHON_COMPARISONS[expr.op]()], [right])
+        return ast.BinOp(left, PYTHON_OPERATORS[expr.op](), right)
+
+    def lower_call(self, node: FunctionCallNode) -> ast.expr:
+        # The function may break or continue the loop around the call, see jump_handlers()
+        self.raises = True
+        name = ast.Constant(node.name)
+        function = ast.IfExp(ast.Compare(name, [ast.In()], [load("env")]), variable(node.name), call(load("undefined"), name))
+        return call(function, *(self.lower_expression(arg) for arg in node.args))
+
+
+PythonTranslator.statement_lowerers = PythonTranslator.compile_dispatch_table(PythonTranslator.statement_lowering_table)
+PythonTranslator.expression_lowerers = PythonTranslator.compile_dispatch_table(PythonTranslator.expression_lowering_table)
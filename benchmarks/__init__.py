@@ -0,0 +1,3 @@
+from .corpus import SHAPES, CorpusGenerator, generate
+from .suite import DEFAULT_SIZES, PHASES, measure, run_suite, compare
+from util.metrics import ast_size
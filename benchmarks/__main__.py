@@ -0,0 +1,34 @@
+"""
+End-to-end benchmarks: python -m benchmarks [--shapes ...] [--sizes ...] [--output baseline.json] [--compare baseline.json]
+"""
+import sys
+import argparse
+from .corpus import SHAPES
+from .suite import DEFAULT_SIZES, run_suite, save_baseline, load_baseline, compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time lexing, parsing and interpretation of generated .kyle programs")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES), help="program sizes such as 1K 10M (default: 1K up to 100M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per phase, the fastest one is kept")
+    parser.add_argument("--output", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare the results against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown (or AST growth) ratio reported as a regression")
+    parser.add_argument("--memory", action="store_true", help="also report the parsed AST's size in bytes and bytes per node")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.shapes, args.sizes, args.seed, args.repeat, log=None if args.compare else print, memory=args.memory)
+    if args.output:
+        save_baseline(report, args.output)
+    if not args.compare:
+        return 0
+    regressions = compare(report, load_baseline(args.compare), args.tolerance)
+    for shape, size, phase, ratio in regressions:
+        print(f"REGRESSION {shape} {size} {phase}: x{ratio:.2f} {'larger' if phase == 'memory' else 'slower'} than the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import random
+import string
+
+
+#shapes the generator knows how to produce, each one stresses a different part of the pipeline
+SHAPES = ("assignments", "prints", "strings", "nested", "comments", "mixed")
+
+#lowercase words are safe inside string literals and comments (no quotes, no newlines)
+ALPHABET = string.ascii_lowercase + " "
+
+
+def parse_size(text):
+    """Turn '1K', '10M' or a plain byte count into a number of bytes"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = str(text).strip().upper().removesuffix("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit, scale in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+class CorpusGenerator:
+    """Seeded generator of valid .kyle programs of a given shape and (approximate) size.
+
+    The same seed, shape and size always produce the same program, so
+    timings taken on different commits are measured on identical input.
+    """
+    def __init__(self, seed=0, depth=32, string_length=(64, 2048), variables=64):
+        self.seed = seed
+        self.depth = depth #how deep 'nested' programs stack if/otherwise blocks
+        self.string_length = string_length
+        self.variables = variables
+        self.rng = random.Random(seed)
+
+    def generate(self, shape, size):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown corpus shape '{shape}', expected one of {', '.join(SHAPES)}")
+        self.rng.seed(f"{self.seed}:{shape}:{size}")
+        emit = getattr(self, f"emit_{shape}")
+        #every program starts by defining the variables the other statements read: v* hold integers, s* strings
+        parts = [f"v{index} = {index}\ns{index} = \"s{index}\"\n" for index in range(self.variables)]
+        length = sum(map(len, parts))
+        while length < size:
+            part = emit()
+            parts.append(part)
+            length += len(part)
+        return "".join(parts)
+
+    def variable(self, prefix="v"):
+        #conditions compare v* against integers, so strings only ever go into s*
+        return f"{prefix}{self.rng.randrange(self.variables)}"
+
+    def text(self, low, high):
+        return "".join(self.rng.choices(ALPHABET, k=self.rng.randint(low, high)))
+
+    def emit_assignments(self):
+        if self.rng.random() < 0.5:
+            return f"{self.variable()} = {self.rng.randrange(1 << 31)}\n"
+        return f'{self.variable("s")} = "{self.text(1, 24)}"\n'
+
+    def emit_prints(self):
+        if self.rng.random() < 0.5:
+            return f"builtin_print({self.variable(self.rng.choice('vs'))})\n"
+        return f'builtin_print("{self.text(1, 48)}")\n'
+
+    def emit_strings(self):
+        return f'{self.variable("s")} = "{self.text(*self.string_length)}"\n'
+
+    def emit_nested(self, depth=None):
+        depth = self.depth if depth is None else depth
+        indent = "\t" * (self.depth - depth)
+        body = self.emit_nested(depth - 1) if depth > 1 else f"{indent}\t{self.emit_assignments()}"
+        return (
+            f"{indent}if ({self.variable()} >= {self.rng.randrange(self.variables)}){{\n"
+            f"{body}"
+            f"{indent}}}otherwise{{\n"
+            f"{indent}\t{self.emit_prints()}"
+            f"{indent}}}\n"
+        )
+
+    def emit_comments(self):
+        roll = self.rng.random()
+        if roll < 0.45:
+            return f"# {self.text(8, 96)}\n"
+        if roll < 0.9:
+            lines = "\n".join(self.text(8, 96) for _ in range(self.rng.randint(1, 6)))
+            return f"/* {lines} */\n"
+        return self.emit_assignments()
+
+    def emit_mixed(self):
+        emit = self.rng.choice((self.emit_assignments, self.emit_prints, self.emit_strings, self.emit_comments))
+        if self.rng.random() < 0.05:
+            return self.emit_nested(self.rng.randint(1, self.depth))
+        return emit()
+
+
+def generate(shape, size, seed=0, **options):
+    """One-shot helper: a .kyle program of `shape` that is at least `size` bytes long"""
+    return CorpusGenerator(seed, **options).generate(shape, parse_size(size))
@@ -0,0 +1,127 @@
+import gc
+import os
+import sys
+import json
+import time
+import platform
+from contextlib import redirect_stdout
+from lexer import Lexer
+from parser import Parser
+from Semantics import Interpreter
+from .corpus import SHAPES, CorpusGenerator, parse_size, format_size
+from util.metrics import ast_size
+
+
+#1 KB up to 100 MB, one decade at a time
+DEFAULT_SIZES = ("1K", "10K", "100K", "1M", "10M", "100M")
+PHASES = ("lex", "parse", "interpret")
+
+
+def best_of(repeat, setup, run):
+    """Smallest wall time of `repeat` runs of run(setup()), plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        argument = setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = run(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure(source, repeat=3, memory=False):
+    """Time Lexer.tokenize, Parser.parse and Interpreter.interpret separately on one source.
+
+    Each phase gets fresh input built outside the timed region. A phase that
+    raises is recorded under 'errors' and the phases depending on it are skipped.
+    With `memory` the parsed tree is also sized (see util.metrics.ast_size).
+    """
+    timings, errors, size = {}, {}, None
+    try:
+        timings["lex"], (_, tokens) = best_of(repeat, lambda: Lexer(source), lambda lexer: lexer.tokenize())
+        timings["parse"], program = best_of(repeat, lambda: list(tokens), lambda tokens: Parser(tokens).parse())
+        size = ast_size(program) if memory else None
+        with open(os.devnull, "w") as sink, redirect_stdout(sink):
+            timings["interpret"], _ = best_of(repeat, Interpreter, lambda interpreter: interpreter.interpret(program))
+    except (Exception, SystemExit) as e: #the lexer panics with sys.exit on illegal input
+        errors[PHASES[len(timings)]] = f"{type(e).__name__}: {e}"
+    return {
+        "tokens": len(tokens) if "lex" in timings else None,
+        "seconds": timings,
+        "mb_per_second": {phase: len(source) / seconds / (1 << 20) for phase, seconds in timings.items() if seconds},
+        "errors": errors,
+        **({"memory": size} if size else {}),
+    }
+
+
+def run_suite(shapes=SHAPES, sizes=DEFAULT_SIZES, seed=0, repeat=3, log=None, memory=False):
+    generator = CorpusGenerator(seed)
+    results = []
+    for shape in shapes:
+        for size in map(parse_size, sizes):
+            source = generator.generate(shape, size)
+            result = {"shape": shape, "size": format_size(size), "bytes": len(source), **measure(source, repeat, memory)}
+            results.append(result)
+            if log:
+                log(format_result(result))
+            del source
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def format_result(result, baseline=None):
+    cells = []
+    for phase in PHASES:
+        if phase in result["errors"]:
+            cells.append(f"{phase} FAILED")
+        elif phase in result["seconds"]:
+            cell = f"{phase} {result['seconds'][phase] * 1000:10.2f}ms"
+            previous = (baseline or {}).get("seconds", {}).get(phase)
+            if previous:
+                cell += f" (x{result['seconds'][phase] / previous:.2f})"
+            cells.append(cell)
+    if "memory" in result:
+        cell = f"ast {result['memory']['bytes'] / (1 << 20):8.2f}MB {result['memory']['bytes_per_node']:6.1f}B/node"
+        previous = (baseline or {}).get("memory", {}).get("bytes")
+        if previous:
+            cell += f" (x{result['memory']['bytes'] / previous:.2f})"
+        cells.append(cell)
+    return f"{result['shape']:>12} {result['size']:>5}  " + "  ".join(cells)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def compare(report, baseline, tolerance=1.25, out=sys.stdout):
+    """Print every (shape, size) next to its baseline and return the phases that got slower than `tolerance`
+    (or, under the 'memory' phase, ASTs that grew by more than it)"""
+    previous = {(result["shape"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["shape"], result["size"]))
+        print(format_result(result, old), file=out)
+        for phase, seconds in result["seconds"].items():
+            before = (old or {}).get("seconds", {}).get(phase)
+            if before and seconds / before > tolerance:
+                regressions.append((result["shape"], result["size"], phase, seconds / before))
+        before = (old or {}).get("memory", {}).get("bytes")
+        if before and "memory" in result and result["memory"]["bytes"] / before > tolerance:
+            regressions.append((result["shape"], result["size"], "memory", result["memory"]["bytes"] / before))
+    return regressions
@@ -1,36 +1,199 @@
 from type_decl.lexer_types import TokenType
+from type_decl.parser_types import (ProgramNode, FunctionNode, IfNode, WhileNode, ForNode, ReturnNode, GotoNode,
+                                    BreakNode, ContinueNode, SwitchNode, CaseNode, FunctionCallNode, BinaryOpNode,
+                                    CompareNode, UnaryOpNode, IntegerNode, FloatNode, StringNode, AssignmentNode)
 
-#function map for each type of encountered token
+#bumped whenever parsing output changes, cached ASTs (parser.cache) of other versions are never loaded
+COMPILER_VERSION = "0.0.1"
+
+#function map for each type of encountered token (Parser resolves the names to functions once per class)
 parser_dispatch_table = {
-    f"{TokenType.EQUAL.value}":"parse_assignment",
-    f"{TokenType.IDENTIFIER.value}":"parse_statment",
-    f"{TokenType.STRING_LITERAL.value}":"parse_expression",
-    f"{TokenType.INTEGER.value}":"parse_expression",
-    f"{TokenType.FLOAT_LITERAL.value}":"parse_expression",
-    f"{TokenType.FUN.value}":"parse_function",
-    f"{TokenType.IF.value}":"parse_if_statement",
-    f"{TokenType.WHILE.value}":"parse_while_statement",
-    f"{TokenType.FOR.value}":"parse_for_statement",
-    f"{TokenType.RETURN.value}":"parse_return_statement",
-    f"{TokenType.GOTO.value}":"parse_goto_statement",
-    f"{TokenType.BAILOUT.value}":"parse_bailout_statement",
-    f"{TokenType.BREAK.value}":"parse_break_statement",
-    f"{TokenType.CONTINUE.value}":"parse_continue_statement",
-    f"{TokenType.SWITCH.value}":"parse_switch_statement",
-    f"{TokenType.CASE.value}":"parse_case_statement",
-    f"{TokenType.DEFAULT.value}":"parse_default_statement",
+    TokenType.EQUAL:"parse_assignment",
+    TokenType.IDENTIFIER:"parse_statment",
+    TokenType.STRING_LITERAL:"parse_expression",
+    TokenType.INTEGER:"parse_expression",
+    TokenType.FLOAT_LITERAL:"parse_expression",
+    TokenType.FUN:"parse_function",
+    TokenType.IF:"parse_if_statement",
+    TokenType.WHILE:"parse_while_statement",
+    TokenType.FOR:"parse_for_statement",
+    TokenType.RETURN:"parse_return_statement",
+    TokenType.GOTO:"parse_goto_statement",
+    TokenType.BAILOUT:"parse_bailout_statement",
+    TokenType.BREAK:"parse_break_statement",
+    TokenType.CONTINUE:"parse_continue_statement",
+    TokenType.SWITCH:"parse_switch_statement",
+    TokenType.CASE:"parse_case_statement",
+    TokenType.DEFAULT:"parse_default_statement",
+}
+
+
+#method run for each type of statement node (Interpreter resolves the names to functions once per class)
+#bodies are plain lists of statements, bare strings are the old "FunctionCall(...)" statement form
+#expression statements go straight to their evaluate_* method, dispatch never adds a frame of its own
+interpreter_statement_table = {
+    ProgramNode:"interpret_program",
+    AssignmentNode:"interpret_assignment",
+    FunctionCallNode:"interpret_function_call",
+    FunctionNode:"interpret_function_definition",
+    IfNode:"interpret_if",
+    WhileNode:"interpret_while",
+    ForNode:"interpret_for",
+    SwitchNode:"interpret_switch",
+    CaseNode:"interpret_case",
+    ReturnNode:"interpret_return",
+    BreakNode:"interpret_break",
+    ContinueNode:"interpret_continue",
+    GotoNode:"interpret_goto",
+    BinaryOpNode:"evaluate_binary",
+    CompareNode:"evaluate_binary",
+    UnaryOpNode:"evaluate_unary",
+    IntegerNode:"evaluate_literal",
+    FloatNode:"evaluate_literal",
+    StringNode:"evaluate_literal",
+    list:"interpret_block",
+    str:"interpret_string_statement",
+}
+
+#method evaluating each type of expression, identifiers are kept as plain str names
+#anything missing evaluates to its .value (or to itself), like the literals assignments unwrap
+interpreter_expression_table = {
+    str:"evaluate_name",
+    BinaryOpNode:"evaluate_binary",
+    CompareNode:"evaluate_binary",
+    UnaryOpNode:"evaluate_unary",
+    FunctionCallNode:"interpret_function_call",
+    IntegerNode:"evaluate_literal",
+    FloatNode:"evaluate_literal",
+    StringNode:"evaluate_literal",
+    int:"evaluate_constant",
+    float:"evaluate_constant",
+    bool:"evaluate_constant",
+}
+
+
+#builder of the closure each type of statement node compiles to (see Semantics.closures.ClosureCompiler)
+closure_statement_table = {
+    ProgramNode:"compile_program",
+    AssignmentNode:"compile_assignment",
+    FunctionCallNode:"compile_call",
+    FunctionNode:"compile_function_definition",
+    IfNode:"compile_if",
+    WhileNode:"compile_while",
+    ForNode:"compile_for",
+    SwitchNode:"compile_switch",
+    CaseNode:"compile_case",
+    ReturnNode:"compile_return",
+    BreakNode:"compile_break",
+    ContinueNode:"compile_continue",
+    GotoNode:"compile_goto",
+    BinaryOpNode:"compile_expression_statement",
+    CompareNode:"compile_expression_statement",
+    UnaryOpNode:"compile_expression_statement",
+    IntegerNode:"compile_expression_statement",
+    FloatNode:"compile_expression_statement",
+    StringNode:"compile_expression_statement",
+    list:"compile_block",
+    str:"compile_string_statement",
+}
+
+#builder of the closure each type of expression compiles to, anything missing compiles to its .value
+closure_expression_table = {
+    str:"compile_name",
+    BinaryOpNode:"compile_binary",
+    CompareNode:"compile_binary",
+    UnaryOpNode:"compile_unary",
+    FunctionCallNode:"compile_call",
+    IntegerNode:"compile_literal",
+    FloatNode:"compile_literal",
+    StringNode:"compile_literal",
+    int:"compile_constant",
+    float:"compile_constant",
+    bool:"compile_constant",
+}
+
+
+#lowering of each type of statement node to Python statements (see Semantics.translator.PythonTranslator)
+translator_statement_table = {
+    ProgramNode:"lower_program",
+    AssignmentNode:"lower_assignment",
+    FunctionCallNode:"lower_expression_statement",
+    FunctionNode:"lower_function_definition",
+    IfNode:"lower_if",
+    WhileNode:"lower_while",
+    ForNode:"lower_for",
+    SwitchNode:"lower_switch",
+    CaseNode:"lower_case",
+    ReturnNode:"lower_return",
+    BreakNode:"lower_break",
+    ContinueNode:"lower_continue",
+    GotoNode:"lower_goto",
+    BinaryOpNode:"lower_expression_statement",
+    CompareNode:"lower_expression_statement",
+    UnaryOpNode:"lower_expression_statement",
+    IntegerNode:"lower_expression_statement",
+    FloatNode:"lower_expression_statement",
+    StringNode:"lower_expression_statement",
+    list:"lower_block",
+    str:"lower_string_statement",
+}
+
+#lowering of each type of expression to a Python expression, anything missing becomes a constant of its .value
+translator_expression_table = {
+    str:"lower_name",
+    BinaryOpNode:"lower_binary",
+    CompareNode:"lower_binary",
+    UnaryOpNode:"lower_unary",
+    FunctionCallNode:"lower_call",
+    IntegerNode:"lower_literal",
+    FloatNode:"lower_literal",
+    StringNode:"lower_literal",
+    int:"lower_constant",
+    float:"lower_constant",
+    bool:"lower_constant",
 }
 
 
 #type infering for generalization judgements of token types
+#groups are frozensets so membership checks on the hot path are a single hash lookup
 type_look_up_reference = {
-    "LITERALS":[TokenType.INTEGER,TokenType.STRING_LITERAL, TokenType.FLOAT_LITERAL],
-    "OPERATORS":[TokenType.EQUAL],
-    "KEYWORDS":[TokenType.FUN, TokenType.IF, TokenType.WHILE, TokenType.FOR, TokenType.RETURN, 
+    "LITERALS":frozenset({TokenType.INTEGER,TokenType.STRING_LITERAL, TokenType.FLOAT_LITERAL}),
+    "OPERATORS":frozenset({TokenType.EQUAL}),
+    #tokens an expression can start with
+    "OPERANDS":frozenset({TokenType.INTEGER, TokenType.STRING_LITERAL, TokenType.FLOAT_LITERAL,
+                          TokenType.IDENTIFIER, TokenType.LPAREN, TokenType.MINUS}),
+    #what ends a run of statements / arguments / a for-clause: the closing token, or running into the EOF token
+    "BLOCK_END":frozenset({TokenType.RBRACE, TokenType.EOF}),
+    "GROUP_END":frozenset({TokenType.RPAREN, TokenType.EOF}),
+    "STATEMENT_END":frozenset({TokenType.SEMICOLON, TokenType.EOF}),
+    #what ends the body of a case (or default): the next one, or the end of the switch
+    "CASE_END":frozenset({TokenType.CASE, TokenType.DEFAULT, TokenType.RBRACE, TokenType.EOF}),
+    "COMPARISONS":frozenset({TokenType.GREATER, TokenType.LESS, TokenType.GREATER_EQUAL,
+                             TokenType.LESS_EQUAL, TokenType.EQUAL, TokenType.NOT_EQUAL}),
+    "KEYWORDS":frozenset({TokenType.FUN, TokenType.IF, TokenType.WHILE, TokenType.FOR, TokenType.RETURN, 
                TokenType.GOTO, TokenType.BAILOUT, TokenType.BREAK, TokenType.CONTINUE, 
-               TokenType.SWITCH, TokenType.CASE, TokenType.DEFAULT],
-    "CONTROL_FLOW":[TokenType.IF, TokenType.WHILE, TokenType.FOR, TokenType.SWITCH],
-    "JUMP_STATEMENTS":[TokenType.RETURN, TokenType.GOTO, TokenType.BAILOUT, TokenType.BREAK, TokenType.CONTINUE]
+               TokenType.SWITCH, TokenType.CASE, TokenType.DEFAULT}),
+    #keywords a statement can start with, where a recovering parser resumes after an error
+    "STATEMENT_KEYWORDS":frozenset({TokenType.FUN, TokenType.IF, TokenType.WHILE, TokenType.FOR, TokenType.RETURN,
+               TokenType.GOTO, TokenType.BAILOUT, TokenType.BREAK, TokenType.CONTINUE, TokenType.SWITCH}),
+    "CONTROL_FLOW":frozenset({TokenType.IF, TokenType.WHILE, TokenType.FOR, TokenType.SWITCH}),
+    "JUMP_STATEMENTS":frozenset({TokenType.RETURN, TokenType.GOTO, TokenType.BAILOUT, TokenType.BREAK, TokenType.CONTINUE})
+}
+
+
+#binding power of every binary operator for Parser.parse_expression (higher binds tighter)
+operator_precedence = {
+    TokenType.DOUBLE_ANPERSAND: 1,
+    TokenType.EQUAL: 2,
+    TokenType.NOT_EQUAL: 2,
+    TokenType.GREATER: 2,
+    TokenType.LESS: 2,
+    TokenType.GREATER_EQUAL: 2,
+    TokenType.LESS_EQUAL: 2,
+    TokenType.PLUS: 3,
+    TokenType.MINUS: 3,
+    TokenType.MULTIPLY: 4,
+    TokenType.DIVIDE: 4,
 }
 
 
@@ -41,10 +204,10 @@ def contextful_unterminated_assignError(self):
     try:
         twice_prior = self.token_stream.peek_back(two_steps)
     except StopIteration:
-        twice_prior = f"{self.token_stream.data[:((self.token_stream.cursor -1 ) if self.token_stream.cursor > 1 else self.token_stream.cursor)][-1].value}" if self.token_stream.cursor > 0 else "< Corrupted Internal State>"
-    twice_prior = (twice_prior.value if not isinstance(twice_prior,str) else twice_prior) + " ="
+        twice_prior = f"{self.token_stream.peek_back().value}" if self.token_stream.cursor > 0 else "< Corrupted Internal State>"
+    twice_prior = (str(twice_prior.value) if not isinstance(twice_prior,str) else twice_prior) + " ="
     padding = "\n" + ((len(twice_prior) + alignment_extension) * ' ')
-    found = self.token_stream.current() if self.token_stream.current() else "< EOF >" 
+    found = self.token_stream.current() if self.token_stream.current().type != TokenType.EOF else "< EOF >" 
     expected = self.extensions["expected_next_tokens"](self)
     debug_message = f"^^^ <Rvalue aka {expected} needed/expected here but <{found}> provided >"
     error_type = "\nunterminated assignment\n"
@@ -69,7 +232,7 @@ def get_type_examples(types):
 
 def expected_next_tokens(self):
     curr = self.token_stream.current()
-    if not curr:curr = self.token_stream.peek_back()
+    if curr.type == TokenType.EOF:curr = self.token_stream.peek_back()
     match curr.type:
         case TokenType.IDENTIFIER:
             return [TokenType.EQUAL, TokenType.LPAREN]
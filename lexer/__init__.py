@@ -1 +1,2 @@
-from .lexer import *
\ No newline at end of file
+from .lexer import *
+from .parallel import tokenize_parallel
\ No newline at end of file
@@ -1,148 +1,228 @@
+import re
+import mmap
 from util.iohelpers import panic
 from util.facilitators import StreamIterator
-from type_decl.lexer_types import RESERVED, CTOT_MAP, TokenType, Token
+from type_decl.lexer_types import RESERVED, CTOT_MAP, TOKEN_CODES, TokenType, Token, TokenBuffer, LineIndex, CommentTable, Diagnostic
 
 
+#keywords are matched as plain words first and then resolved through this map
+KEYWORDS = {word: CTOT_MAP.get(word, TokenType.KEYWORD) for word in RESERVED}
 
+#the same lookups keyed for the compact scanner, which only records small int codes (str and utf-8 keys side by side)
+KEYWORD_CODES = {key: TOKEN_CODES[type] for word, type in KEYWORDS.items() for key in (word, word.encode())}
+OPERATOR_CODES = {key: TOKEN_CODES[type] for op, type in CTOT_MAP.items() for key in (op, op.encode())}
+
+#master pattern groups that produce a token, everything else is an error or the end of the buffer
+TOKEN_KINDS = frozenset({"WORD", "OP", "INTEGER", "STRING"})
+
+#entries of CTOT_MAP that get their own rule in the master pattern instead of a plain operator match
+SPECIAL_CHAROPS = {"#", "/*", "'", '"'}
+
+
+#block comments are matched unrolled ("not a star" runs, then stars) instead of a lazy .*? that retries the close at every char
+COMMENT_RULE = r"\#[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+
+
+def build_master_pattern(binary=False, comments=False):
+    """Compile every lexical rule into one alternation, ordered by priority.
+
+    Operators are taken straight from CTOT_MAP (longest first) so adding a new
+    operator there is enough for the scanner to pick it up. The binary variant
+    scans raw utf-8 bytes, where every non-ascii byte counts as a word byte.
+    Comments are skipped along with whitespace unless `comments` asks for them
+    to come out as COMMENT matches (for the side table).
+    """
+    word = r"[\w\x80-\xff]" if binary else r"\w"
+    operators = sorted(
+        (op for op in CTOT_MAP if op not in RESERVED and op not in SPECIAL_CHAROPS),
+        key=len, reverse=True
+    )
+    rules = [
+        ("COMMENT", COMMENT_RULE),
+        ("UNTERMINATED_COMMENT", r"/\*"),
+        ("STRING", r'"[^"\n]*"|\'[^\'\n]*\''),
+        ("UNTERMINATED_STRING", r"[\"']"),
+        ("INTEGER", rf"\d+(?!{word})"),
+        ("WORD", rf"{word}+"),
+        ("OP", "|".join(re.escape(op) for op in operators)),
+        ("ILLEGAL", r"(?s:.)"),
+        ("END", r"\Z"),
+    ]
+    if not comments:
+        rules = rules[1:]
+    #leading whitespace (and comments, unless asked for) is folded into every match so it never costs a match of its own
+    skipped = r"[ \t\r\n]" if comments else rf"[ \t\r\n]+|{COMMENT_RULE}"
+    alternatives = "|".join(f"(?P<{name}>{rule})" for name, rule in rules)
+    pattern = f"(?:{skipped})*+(?:{alternatives})"
+    return re.compile(pattern.encode() if binary else pattern)
+
+
+MASTER_PATTERN = build_master_pattern()
+BINARY_MASTER_PATTERN = build_master_pattern(binary=True)
+COMMENT_MASTER_PATTERN = build_master_pattern(comments=True)
+BINARY_COMMENT_MASTER_PATTERN = build_master_pattern(binary=True, comments=True)
+WORD_PATTERN = re.compile(r"\w+")
+
+#how many characters iter_tokens() pulls from a file-like source at a time
+CHUNK_SIZE = 1 << 16
 
 
 class Lexer:
-    def __init__(self,data):
-        self.data = data.lstrip().rstrip()
-        self.stream = StreamIterator(self.data,label="Raw String Stream")
-        self.tmp = None 
+    def __init__(self,data,chunk_size=CHUNK_SIZE,comments=False,recover=False):
+        self.data = data #the whole source (str or a bytes-like buffer such as an mmap) or a file-like object read lazily by iter_tokens()
+        self.in_place = isinstance(data, (str, bytes, bytearray, memoryview, mmap.mmap))
+        self.binary = self.in_place and not isinstance(data, str)
+        self.chunk_size = chunk_size
+        self.label = "Raw String Stream"
         self.tokens_output = []
-        self.neglect = [" ","\t","\n", "\r"]
-        self.quotes = [TokenType.DOUBLE_QUOTE, TokenType.SINGLE_QUOTE]
+        self.lines = LineIndex(data if self.in_place else None)
+        self.offset_base = 0 #source offset of the front of the current scan buffer (only moves for streamed sources)
+        #comments never reach the token stream, tooling that wants them asks for their spans in this side table
+        self.comments = CommentTable(data if self.in_place else None) if comments else None
+        #recovering lexers report every bad lexeme here and keep scanning instead of panicking on the first
+        self.diagnostics = [] if recover else None
     def start_lexer_loop(self):
-        while self.stream.has_next():
-            self.skip_tokens()
-            if self.get_pair_charop():
-                if self.tmp.type == TokenType.BULK_COMMENT_TAG_LEFT:
-                    self.tmp = Token(TokenType.COMMENT,self.pair_lookup_collect_until(TokenType.BULK_COMMENT_TAG_RIGHT.value))
-                else:
-                    self.stream.next()
-                    self.stream.next()
-                self.tokens_output.append(self.tmp)
-                continue
+        self.tokens_output.extend(self.iter_tokens())
+    def iter_tokens(self, start=0):
+        """Lazily yield final tokens, reading file-like sources chunk by chunk.
+
+        In-memory and mapped sources can be scanned from any token boundary
+        `start`, which is how edited buffers get re-lexed piecewise.
+        """
+        #bytes sources are only decoded one token value at a time, when the token gets built
+        #tokens only record their start offset, line/column get resolved from self.lines when needed
+        binary, lines = self.binary, self.lines
+        for match in self.iter_matches(start):
+            kind = match.lastgroup
+            value = match.group(kind).decode() if binary else match.group(kind)
+            offset = self.offset_base + match.start(kind)
+            if kind == "WORD":
+                yield Token(KEYWORDS.get(value, TokenType.IDENTIFIER), value, offset, lines)
+            elif kind == "OP":
+                yield Token(CTOT_MAP[value], value, offset, lines)
+            elif kind == "INTEGER":
+                yield Token(TokenType.INTEGER, int(value), offset, lines)
             else:
-                if self.stream.current() in CTOT_MAP:
-                    token = Token(CTOT_MAP.get(self.stream.current(),TokenType.ILLEGAL_SYMBOL),self.stream.current())
-                    if token.type == TokenType.TAG:
-                        token = self.collect_until("\n",type=TokenType.COMMENT)
-                    elif token.type in self.quotes:
-                        token = self.collect_string_literal_after_quote(token)
-                    self.tokens_output.append(token)
-                    self.stream.next()
+                yield Token(TokenType.STRING_LITERAL, value[1:-1], offset, lines)
+        #every stream ends with an EOF token, so consumers never have to catch running off the end
+        yield Token(TokenType.EOF, "", len(self.data) if self.in_place else self.offset_base, lines)
+    def tokenize_compact(self, start=0, end=None):
+        """Lex an in-memory or mapped source into a TokenBuffer: no Token objects, only codes and offsets.
+
+        `start`/`end` restrict the scan to one slice of the source cut at token
+        boundaries; offsets stay relative to the whole source.
+        """
+        if not self.in_place:
+            raise TypeError("tokenize_compact() needs the whole source in memory or mapped, use iter_tokens() for streams")
+        tokens = TokenBuffer(self.data)
+        append_kind, append_start, append_end = tokens.kinds.append, tokens.starts.append, tokens.ends.append
+        integer, string = TOKEN_CODES[TokenType.INTEGER], TOKEN_CODES[TokenType.STRING_LITERAL]
+        identifier = TOKEN_CODES[TokenType.IDENTIFIER]
+        for match in self.iter_matches(start, end):
+            kind = match.lastgroup
+            if kind == "WORD":
+                append_kind(KEYWORD_CODES.get(match.group(kind), identifier))
+            elif kind == "OP":
+                append_kind(OPERATOR_CODES[match.group(kind)])
+            elif kind == "INTEGER":
+                append_kind(integer)
+            else:
+                append_kind(string)
+            append_start(match.start(kind))
+            append_end(match.end())
+        if end is None:
+            tokens.append_eof()
+        return tokens
+    def iter_matches(self, start=0, end=None):
+        if self.in_place:
+            #in-memory and mapped sources are scanned in place, no copy of the source is made
+            yield from self.scan(self.data, len(self.data) if end is None else end, final=True, start=start)
+            return
+        if start or end is not None:
+            raise ValueError("Streamed sources can only be lexed whole, from the beginning")
+        #unscanned text is kept as a list of chunks and only joined when a scan can make progress,
+        #so a source without newlines (or one long /* */ block) is copied once instead of on every read
+        pending, read, last, closing = [], self.offset_base, "", False
+        while True:
+            chunk = self.data.read(self.chunk_size)
+            #line starts go into the index as soon as they are read, before any of the chunk's tokens are handed out
+            self.lines.feed(chunk, read, len(chunk))
+            read += len(chunk)
+            if chunk:
+                pending.append(chunk)
+                if closing and "*/" in last + chunk:
+                    closing = False
+                last = chunk[-1]
+                #only scan up to the last newline: no token other than a /* */ block can run across it
+                if closing or "\n" not in chunk:
+                    continue
+            buffer = "".join(pending)
+            if not chunk:
+                yield from self.scan(buffer, len(buffer), final=True)
+                self.offset_base += len(buffer)
+                return
+            end = buffer.rfind("\n") + 1
+            stop = yield from self.scan(buffer, end, final=False)
+            self.offset_base += stop
+            #a scan stopping short of the newline left a /* */ block open, rescanning waits for a */
+            pending, closing = [buffer[stop:]], stop < end
+    def scan(self, buffer, endpos, final, start=0):
+        #single pass over the buffer: every token-producing match of the master pattern is already a final token
+        binary = not isinstance(buffer, str)
+        if self.comments is None:
+            pattern = BINARY_MASTER_PATTERN if binary else MASTER_PATTERN
+        else:
+            pattern = BINARY_COMMENT_MASTER_PATTERN if binary else COMMENT_MASTER_PATTERN
+        while start is not None:
+            matches, start = pattern.finditer(buffer, start, endpos), None
+            for match in matches:
+                kind = match.lastgroup
+                if kind in TOKEN_KINDS:
+                    if binary and kind == "WORD" and not match.group(kind).isascii() and not WORD_PATTERN.fullmatch(match.group(kind).decode()):
+                        self.report("illegal symbol", "Illegal symbol", buffer, match.start(kind))
+                        continue
+                    yield match
+                elif kind == "COMMENT":
+                    self.comments.add(self.offset_base + match.start(kind), self.offset_base + match.end(kind))
+                elif kind == "END":
+                    break
+                elif kind == "UNTERMINATED_COMMENT" and not final:
+                    return match.start(kind) #the closing */ may still be in the next chunk
+                elif kind == "UNTERMINATED_STRING":
+                    self.report("unterminated string", "Unterminated string literal", buffer, match.start(kind), Exception)
+                    #the rest of the line can't be told apart from the string, pick up again on the next one
+                    newline = buffer.find(b"\n" if binary else "\n", match.end(kind), endpos)
+                    start = newline if newline != -1 else None
+                    break
+                elif kind == "UNTERMINATED_COMMENT":
+                    #the comment swallows the rest of the source, nothing left to scan
+                    self.report("unterminated comment", "Unterminated comment", buffer, match.start(kind))
+                    break
                 else:
-                    token = self.collect_until(type=TokenType.IDENTIFIER)
-                    if token:
-                        if token.value in RESERVED:
-                            keyword_token_type = CTOT_MAP.get(token.value, TokenType.KEYWORD)
-                            token = self.convert_token_type(token, keyword_token_type)
-                        if token.type != TokenType.ILLEGAL_SYMBOL:self.tokens_output.append(token)
-                        else:self.raise_error(f"Illegal symbol : {self.stream.return_formatted_state()}")
-                    else:
-                        self.raise_error(f"Illegal symbol : {self.stream.return_formatted_state()}")
-    def pair_lookup_collect_until(self,delim):
-        n = 0
-        value = ""
-        while self.stream.has_next():
-            if self.stream.peek(n) == delim[0] and self.stream.peek(n+1) == delim[1]:
-                n += 1
-                break
-            n+=1
-        value = "".join([self.stream.peek(i) for i in range(n+1)])
-        for i in range(n+1):
-            self.stream.next()
-        return value
+                    self.report("illegal symbol", "Illegal symbol", buffer, match.start(kind))
+        return endpos
+    def report(self, kind, message, buffer, offset, error=None):
+        message = f"{message} : {self.return_formatted_state(buffer, offset)}"
+        if self.diagnostics is None:
+            if error is not None:
+                raise error(message)
+            self.raise_error(message)
+        self.diagnostics.append(Diagnostic(kind, message, self.offset_base + offset))
+    def return_formatted_state(self, buffer, offset):
+        #line/column are only worked out when an error actually needs them
+        #streamed sources have the line starts of the chunk being scanned fed already
+        location = self.lines.locate(self.offset_base + offset)
+        char = str(buffer[offset:offset + 4], "utf-8", "replace")[:1] if self.binary else buffer[offset]
+        return f'"{repr(char)}" at line {location.line} col {location.column} in "{self.label}"'
     def convert_token_type(self,tok:Token,type:TokenType):
-        return Token(type,tok.value)
+        return Token(type,tok.value,tok.offset,tok.lines)
     def raise_error(self,message:str):
         panic(message)
-    def collect_until(self, delim: str = None, type: TokenType = TokenType.IDENTIFIER):
-            ident = ""
-            # Loop while the CURRENT character is valid
-            while self.stream.has_next():
-                curr = self.stream.current()
-                cond = (curr != delim) if delim else self.isalphanum(curr)
-                
-                if not cond:
-                    break
-                    
-                ident += curr
-                self.stream.next() # Move to the next char immediately
-                
-            return Token(type, ident) if ident else None
-    def isalphanum(self,char:str):
-        return char.isdigit() or char.isalpha() or char == "_"
-    def skip_tokens(self):
-        while self.stream.has_next() and self.stream.current() in self.neglect:
-            self.stream.next()
-    def collect_string_literal_after_quote(self,quote:Token):
-        n = 1
-        value = ""
-        peeked_val = ""
-        while self.stream.has_next():
-            try:
-                peeked_val = self.stream.peek(n)
-            except StopIteration:
-                break
-            if peeked_val == "\n" or peeked_val == quote.value:
-                break
-            value += self.stream.peek(n)
-            n+=1
-        if peeked_val != quote.value:
-            raise Exception("Unterminated string literal")
-        else:
-            for i in range(n):
-                self.stream.next()
-            return Token(TokenType.STRING_LITERAL,value)
-    def get_pair_charop(self):
-        try:
-            next = self.stream.peek()
-        except StopIteration:
-            return False
-        pair_op = f"{self.stream.current()}{next}"
-        if  pair_op in CTOT_MAP:
-            self.tmp = Token(CTOT_MAP.get(pair_op,TokenType.ILLEGAL_SYMBOL),pair_op)
-            return True
-        return False
-    def clean_single_token(self,token,tokens:list,iter:StreamIterator):
-        fuck = True
-        try:
-            if token.value.isdigit():
-                tokens.append(Token(TokenType.INTEGER,int(token.value)));fuck = False
-        except AttributeError:
-            pass
-        if fuck:
-            tokens.append(token)
-        iter.next()
+    def tokenize_parallel(self, workers=None):
+        """tokenize_compact() spread over a process pool, see lexer.parallel"""
+        from .parallel import tokenize_parallel
+        return tokenize_parallel(self.data, workers)
     def tokenize(self):
         self.start_lexer_loop()
-        tok_iter = StreamIterator(self.tokens_output,label="Token List")
-        new_list = []
-        quotes = [TokenType.DOUBLE_QUOTE, TokenType.SINGLE_QUOTE]
-        while tok_iter.has_next():
-            curr = tok_iter.current()
-            if curr.type in quotes:
-                try:
-                    twice_ahead = tok_iter.peek(2)
-                    ident = tok_iter.peek()
-                except StopIteration:
-                    self.clean_single_token(curr,new_list,tok_iter)
-                    continue
-                if ident.type == TokenType.IDENTIFIER and twice_ahead.type in quotes and tok_iter.current().type == twice_ahead.type:
-                    new_list.append(Token(TokenType.STRING_LITERAL,ident.value))
-                    for i in range(3):
-                        tok_iter.next()
-                if ident.type in quotes and ident.type == curr.type:
-                    new_list.append(Token(TokenType.STRING_LITERAL,""))
-                    for i in range(2):
-                        tok_iter.next()
-                else:
-                    self.clean_single_token(curr,new_list,tok_iter)
-            else:
-                self.clean_single_token(curr,new_list,tok_iter)
-        self.cleaned_tokens = new_list
-        return StreamIterator(self.cleaned_tokens,label="Parsing Ready Post-Lexing Tokens"),self.cleaned_tokens
\ No newline at end of file
+        self.cleaned_tokens = self.tokens_output
+        return StreamIterator(self.cleaned_tokens,label="Parsing Ready Post-Lexing Tokens"),self.cleaned_tokens
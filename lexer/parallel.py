@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+import mmap
+import multiprocessing
+from bisect import bisect_right
+from type_decl.lexer_types import TokenBuffer
+from .lexer import Lexer
+
+
+#below this many bytes per worker the pool costs more than it saves
+MIN_CHUNK_SIZE = 1 << 20
+
+#everything a newline can hide in: strings and # comments end at the line, so only /* */ blocks matter,
+#but strings and # comments are still matched so a /* inside them is not taken for a block
+SHADOW_PATTERN = r"\"[^\"\n]*\"|'[^'\n]*'|\#[^\n]*|/\*(?s:.*?)(?:\*/|\Z)"
+SHADOW = re.compile(SHADOW_PATTERN)
+BINARY_SHADOW = re.compile(SHADOW_PATTERN.encode())
+
+
+def block_comment_spans(source):
+    """Pre-scan for the [start, end) spans of /* */ blocks, the only tokens that run across a newline"""
+    binary = not isinstance(source, str)
+    if source.find(b"/*" if binary else "/*") == -1:
+        return [] #the common case costs a single find
+    pattern, opener = (BINARY_SHADOW, b"/*") if binary else (SHADOW, "/*")
+    return [match.span() for match in pattern.finditer(source) if match.group().startswith(opener)]
+
+
+def split_points(source, parts):
+    """Offsets cutting `source` into about `parts` equal slices, each right after a newline outside any /* */ block"""
+    newline = b"\n" if not isinstance(source, str) else "\n"
+    blocks = block_comment_spans(source)
+    block_starts = [start for start, _ in blocks]
+    points, size = [0], len(source)
+    for part in range(1, parts):
+        cut = max(size * part // parts, points[-1])
+        while True:
+            cut = source.find(newline, cut)
+            if cut == -1:
+                break
+            index = bisect_right(block_starts, cut) - 1
+            if index < 0 or blocks[index][1] <= cut:
+                break
+            cut = blocks[index][1] #the newline sits inside a block comment, retry past its end
+        if cut == -1:
+            break
+        if cut + 1 > points[-1]:
+            points.append(cut + 1)
+    points.append(size)
+    return points
+
+
+#the source every worker lexes its slices of, handed over once per worker instead of once per slice
+worker_source = None
+
+
+def init_worker(source):
+    global worker_source
+    worker_source = source
+
+
+def lex_slice(bounds):
+    start, end = bounds
+    try:
+        tokens = Lexer(worker_source).tokenize_compact(start, end)
+    except SystemExit as e:
+        #the lexer panics with sys.exit after reporting, that must not take the pool worker down with it
+        return e.code
+    return tokens.kinds, tokens.starts, tokens.ends
+
+
+def tokenize_parallel(source, workers=None, min_chunk_size=MIN_CHUNK_SIZE):
+    """Lex an in-memory or mapped source in a process pool and stitch the slices into one TokenBuffer.
+
+    The source is cut at newlines that no token spans, every worker lexes its
+    slices with offsets into the whole source, so stitching is a plain
+    concatenation of the per-slice arrays. Small sources are lexed in process.
+    """
+    if not isinstance(source, (str, bytes, bytearray, memoryview, mmap.mmap)):
+        raise TypeError("tokenize_parallel() needs the whole source in memory or mapped")
+    workers = workers or os.cpu_count() or 1
+    #a few slices per worker keeps every core busy even when some slices lex slower than others
+    parts = min(workers * 4, len(source) // min_chunk_size)
+    if workers == 1 or parts <= 1:
+        return Lexer(source).tokenize_compact()
+    points = split_points(source, parts)
+    bounds = list(zip(points, points[1:]))
+
+    #forked workers share the source (and an mmap's pages) with the parent, other start methods get a copy
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    if context.get_start_method() != "fork" and isinstance(source, (memoryview, mmap.mmap)):
+        source = bytes(source)
+    tokens = TokenBuffer(source)
+    with context.Pool(min(workers, len(bounds)), initializer=init_worker, initargs=(source,)) as pool:
+        for result in pool.imap(lex_slice, bounds):
+            if not isinstance(result, tuple):
+                sys.exit(result)
+            kinds, starts, ends = result
+            tokens.kinds.extend(kinds)
+            tokens.starts.extend(starts)
+            tokens.ends.extend(ends)
+    tokens.append_eof()
+    return tokens
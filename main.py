@@ -5,11 +5,20 @@ Shows how the compiler converts source code to Python and executes it
 """
 
 from lexer import Lexer
-from parser import Parser
-from Semantics import Interpreter, interpreter
-from util.iohelpers import fmt_c
+from parser import Parser, ASTCache
+from parser.cache import NO_CACHE_VARIABLE
+from Semantics import Interpreter, PythonTranslator, BACKENDS, interpreter
+from Semantics.translator import module_name
+from util.iohelpers import fmt_c, mapped_source
+from util.metrics import PhaseMetrics, write_json
 import sys
 import os
+import io
+import time
+import argparse
+from contextlib import redirect_stdout, redirect_stderr, nullcontext
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 
 INDENT = " " * 4
@@ -25,27 +34,203 @@ email: loginrevoked@gmail.com\n
 \n'It works on my machine, so it's a you problem.'\n
 """
 
-def process_file(filename):
+def process_file(filename, metrics=None, lazy_functions=False, stream=False, backend="interpreter"):
+    #metrics (a util.metrics.PhaseMetrics) times each phase on its own, without it nothing is measured
+    #lazy_functions leaves function bodies unparsed until their first call
+    #backend names the Semantics.BACKENDS entry that runs the program
+    phase = metrics.phase if metrics is not None else lambda name: nullcontext()
     try:
-        with open(filename, "r",encoding="utf-8") as f:
-            source_code = f.read()
-        try:
-            lexer = Lexer(source_code)
-            tok_iter, tokens = lexer.tokenize()
-            
-            parser = Parser(tokens)
-            program = parser.parse()
-            interpreter = Interpreter()
-            #print(INDENT,end="",flush=True)
-            result = interpreter.interpret(program)
-            print(result)
-        except Exception as e:
-            print(f"\n{INDENT}{e}")
+        if stream:
+            return stream_file(filename, metrics, lazy_functions, backend)
+        cache = ASTCache.beside(filename, "lazy" if lazy_functions else "") #None with the cache turned off
+        with mapped_source(filename) as source:
+            program = None
+            if cache is not None:
+                key = cache.key(source)
+                #unchanged sources load their parsed program from the cache and skip lexing and parsing
+                with phase("cache"):
+                    program = cache.load(source, key)
+            if program is None:
+                #the lexer scans the mapped bytes in place and tokens are pulled while parsing, never held as a full list
+                lexer = Lexer(source, recover=True)
+                tokens = scanner = lexer.iter_tokens()
+                try:
+                    if metrics is not None:
+                        #timed phases can't overlap, so the whole source is lexed before parsing starts
+                        with phase("lex"):
+                            tokens = list(scanner)
+                        metrics.counts["tokens"] = len(tokens) - 1 #not counting EOF
+                    with phase("parse"):
+                        parser = Parser(tokens, lazy_functions=lazy_functions)
+                        #one pass reports every lexing and parsing error instead of stopping at the first
+                        program, diagnostics = parser.parse_all(lexer.diagnostics)
+                except Exception as e:
+                    print(f"\n{INDENT}{e}")
+                    return False
+                finally:
+                    scanner.close() #a suspended scanner still holds the mapping and would block unmapping it
+                if diagnostics:
+                    report_diagnostics(program, diagnostics)
+                    return False
+                if cache is not None:
+                    cache.store(program, key=key)
+            #run while the source is still mapped, lazily parsed function bodies locate their errors through it
+            try:
+                interpreter = BACKENDS[backend]()
+                if metrics is not None:
+                    metrics.count_nodes(program)
+                    metrics.count_statements(interpreter)
+                #print(INDENT,end="",flush=True)
+                with phase("interpret"):
+                    result = interpreter.interpret(program)
+                print(result)
+            except Exception as e:
+                print(f"\n{INDENT}{e}")
+                return False
+            return True
 
     except FileNotFoundError:
         print(f"{INDENT}Buddy, that file doesn't exist! give me something located in [{os.getcwd()}]")
     except Exception as e:
         print(f"{INDENT}Error processing file: {e}")
+    return False
+
+def report_diagnostics(program, diagnostics, outcome="nothing was run"):
+    #locations are resolved against the mapped source, so before it gets unmapped
+    for diagnostic in diagnostics:
+        location = program.locate(diagnostic)
+        print(f"\n{INDENT}line {location.line} col {location.column} {diagnostic}")
+    print(f"\n{INDENT}{len(diagnostics)} error(s), {outcome}")
+
+def translate_file(filename, directory):
+    """Write `filename` as an importable Python module (plus its .pyc) into `directory`, returns True on success.
+
+    The module's run() executes the program without the lexer, parser or
+    interpreter, so workers can be shipped the compiled artifacts alone
+    (they only import the self-contained runtime in Semantics.runtime).
+    """
+    try:
+        with mapped_source(filename) as source:
+            lexer = Lexer(source, recover=True)
+            scanner = lexer.iter_tokens()
+            try:
+                program, diagnostics = Parser(scanner).parse_all(lexer.diagnostics)
+            finally:
+                scanner.close()
+            if diagnostics:
+                report_diagnostics(program, diagnostics, "nothing was written")
+                return False
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, module_name(filename) + ".py")
+        PythonTranslator(filename).write_module(program, path, os.path.basename(filename))
+    except FileNotFoundError:
+        print(f"{INDENT}Buddy, that file doesn't exist! give me something located in [{os.getcwd()}]")
+        return False
+    except Exception as e:
+        print(f"\n{INDENT}{e}")
+        return False
+    print(f"{INDENT}{filename} -> {path}")
+    return True
+
+def stream_file(filename, metrics=None, lazy_functions=False, backend="interpreter"):
+    """Run a file one top-level statement at a time, each one as soon as it is parsed.
+
+    Lexing, parsing and interpretation interleave, so output starts right
+    away and memory stays flat, but a syntax error only stops the run once
+    everything before it has executed. Nothing is cached.
+    """
+    phase = metrics.phase if metrics is not None else lambda name: nullcontext()
+    with mapped_source(filename) as source:
+        scanner = Lexer(source).iter_tokens()
+        try:
+            interpreter = BACKENDS[backend]()
+            if metrics is not None:
+                metrics.count_statements(interpreter)
+            #the phases can't be told apart here, they are measured as one
+            with phase("stream"):
+                interpreter.interpret_stream(Parser(scanner, lazy_functions=lazy_functions).iter_statements())
+        except Exception as e:
+            print(f"\n{INDENT}{e}")
+            return False
+        finally:
+            scanner.close() #a suspended scanner still holds the mapping and would block unmapping it
+    return True
+
+def is_source_file(filename):
+    #only the file name itself is checked, dots in the directories leading to it are fine
+    name = os.path.basename(filename)
+    return name.endswith(SUPPORTED_FILE_EXTENSION) and name.count(".") == 1
+
+def collect_sources(paths):
+    """The files named on the command line, with directories expanded to every .kyle file below them"""
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            sources.extend(os.path.join(root, name) for name in sorted(files) if is_source_file(name))
+    return sources
+
+def measure_file(filename, memory=False, lazy_functions=False, stream=False, backend="interpreter"):
+    """process_file() with every phase measured, the report goes to stderr; returns (ok, metrics record)"""
+    metrics = PhaseMetrics(memory)
+    try:
+        ok = process_file(filename, metrics, lazy_functions, stream, backend)
+    finally:
+        metrics.close()
+    print(metrics.format(), file=sys.stderr)
+    return ok, {"file": filename, "ok": ok, **metrics.as_dict()}
+
+def run_captured(filename, measure=False, memory=False, lazy_functions=False, stream=False, backend="interpreter"):
+    """process_file() with everything it prints captured, what batch workers run for every file"""
+    output = io.StringIO()
+    start = time.perf_counter()
+    record = None
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            if measure or memory:
+                ok, record = measure_file(filename, memory, lazy_functions, stream, backend)
+            else:
+                ok = process_file(filename, lazy_functions=lazy_functions, stream=stream, backend=backend)
+        except SystemExit: #panic() exits after reporting, that must not take the worker down
+            ok = False
+    return filename, ok, output.getvalue(), time.perf_counter() - start, record
+
+def run_batch(filenames, workers=None, measure=False, memory=False, json_path=None, lazy_functions=False, stream=False, backend="interpreter"):
+    """Run every file in a process pool, print each one's output in order and a summary at the end.
+
+    Files are handed to workers in chunks, so one long-lived interpreter
+    process runs many scripts. With `measure`/`memory` every file's phases
+    are measured, and `json_path` collects all their records in one JSON
+    list. Returns the number of files that failed.
+    """
+    #with json_path '-' the JSON is all that goes to stdout, the report goes to stderr
+    out = sys.stderr if json_path == "-" else sys.stdout
+    start = time.perf_counter()
+    failed, records = [], []
+    run = partial(run_captured, measure=measure or json_path is not None, memory=memory, lazy_functions=lazy_functions, stream=stream, backend=backend)
+    #big chunks amortize the pickling round trips, small enough to keep every worker busy to the end
+    chunksize = max(1, min(64, len(filenames) // ((workers or os.cpu_count() or 1) * 8)))
+    with ProcessPoolExecutor(workers) as pool:
+        for filename, ok, output, seconds, record in pool.map(run, filenames, chunksize=chunksize):
+            status = fmt_c("ok", "green") if ok else fmt_c("FAILED", "red")
+            print(f"==> {filename} [{status}] {seconds * 1000:.1f}ms", file=out)
+            if output:
+                print(output, end="" if output.endswith("\n") else "\n", file=out)
+            if not ok:
+                failed.append(filename)
+            if record is not None:
+                records.append(record)
+    elapsed = time.perf_counter() - start
+    print("-" * 40, file=out)
+    print(f"{len(filenames)} file(s) in {elapsed:.2f}s: {len(filenames) - len(failed)} ok, {len(failed)} failed", file=out)
+    for filename in failed:
+        print(f"{INDENT}{fmt_c('FAILED', 'red')} {filename}", file=out)
+    if json_path is not None:
+        write_json(records, json_path)
+    return len(failed)
 
 def interactive_mode():
     print(TradeMark)
@@ -96,11 +281,50 @@ def interactive_mode():
             print(f"Error: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-        if not filename.endswith(".kyle") or filename.count(".") > 1:
+    arguments = argparse.ArgumentParser(description="Run .kyle files, or start the interactive interpreter when no paths are given")
+    arguments.add_argument("paths", nargs="*", help=".kyle files or directories to search for them")
+    arguments.add_argument("-j", "--workers", type=int, default=None, help="worker processes for batch runs (default: one per core)")
+    arguments.add_argument("--timings", action="store_true", help="report wall/CPU time of each phase and token, node and statement counts on stderr")
+    arguments.add_argument("--mem", action="store_true", help="like --timings, plus the allocation peak of each phase (tracemalloc, slow)")
+    arguments.add_argument("--json", metavar="PATH", help="also write the measurements as JSON to PATH ('-' for stdout, everything else then goes to stderr)")
+    arguments.add_argument("--stream", action="store_true", help="run each top-level statement as soon as it is parsed (flat memory, no cache)")
+    arguments.add_argument("--backend", choices=BACKENDS, default="interpreter", help="what runs the parsed program: the reference tree walker, 'closures' compiled once from it, or 'python' translated to a Python code object (both faster on loops)")
+    arguments.add_argument("--aot", metavar="DIR", help="translate every file into an importable Python module (and .pyc) in DIR instead of running it")
+    arguments.add_argument("--no-cache", action="store_true", help=f"neither read nor write the __kylecache__ next to the sources (same as setting {NO_CACHE_VARIABLE})")
+    arguments.add_argument("--lazy-functions", action="store_true", help="parse function bodies on their first call (errors in bodies never called go unreported)")
+    args = arguments.parse_args()
+    if args.no_cache:
+        #through the environment, so batch workers see it too
+        os.environ[NO_CACHE_VARIABLE] = "1"
+    if not args.paths:
+        interactive_mode()
+        sys.exit()
+    filenames = collect_sources(args.paths)
+    for filename in filenames:
+        if not is_source_file(filename):
             print(f"{INDENT}Buddy, that's not a valid {fmt_c(repr(SUPPORTED_FILE_EXTENSION), 'green')} file rename it to something like < {fmt_c(repr(EXAMPLE_FILENAME), 'green')} >")
-            sys.exit()
-        process_file(sys.argv[1])
+            sys.exit(2)
+    if args.aot is not None:
+        #modules all land flat in one directory, two sources sharing a module name would overwrite each other
+        modules = {}
+        for filename in filenames:
+            modules.setdefault(module_name(filename), []).append(filename)
+        clashes = {name: sources for name, sources in modules.items() if len(sources) > 1}
+        for name, sources in clashes.items():
+            print(f"{INDENT}{', '.join(sources)} would all be written to {os.path.join(args.aot, name + '.py')}, rename all but one")
+        if clashes:
+            sys.exit(1)
+        failed = [filename for filename in filenames if not translate_file(filename, args.aot)]
+        sys.exit(1 if failed else 0)
+    measure = args.timings or args.mem or args.json is not None
+    if len(filenames) == 1 and not os.path.isdir(args.paths[0]):
+        if not measure:
+            sys.exit(0 if process_file(filenames[0], lazy_functions=args.lazy_functions, stream=args.stream, backend=args.backend) else 1)
+        #with --json - the JSON is all that goes to stdout, the program's own output goes to stderr
+        with redirect_stdout(sys.stderr) if args.json == "-" else nullcontext():
+            ok, record = measure_file(filenames[0], args.mem, args.lazy_functions, args.stream, args.backend)
+        if args.json is not None:
+            write_json([record], args.json)
+        sys.exit(0 if ok else 1)
     else:
-        interactive_mode()
+        sys.exit(1 if run_batch(filenames, args.workers, measure, args.mem, args.json, args.lazy_functions, args.stream, args.backend) else 0)
@@ -1 +1,3 @@
-from .parser import *
\ No newline at end of file
+from .parser import *
+from .incremental import IncrementalDocument
+from .cache import ASTCache
\ No newline at end of file
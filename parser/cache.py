@@ -0,0 +1,110 @@
+import io
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from type_decl.lexer_types import LineIndex
+from configurables.decl import COMPILER_VERSION
+
+
+#the directory caches go in next to the sources they were compiled from, like __pycache__
+CACHE_DIRECTORY = "__kylecache__"
+#set (to anything non-empty) it turns the cache off, main.py --no-cache sets it for its batch workers too
+NO_CACHE_VARIABLE = "KYLENOCACHE"
+#like PYTHONPYCACHEPREFIX: every cache goes under this directory, mirroring the sources' paths, instead of next to them
+CACHE_PREFIX_VARIABLE = "KYLECACHEPREFIX"
+CACHE_EXTENSION = ".kylec"
+#an entry is MAGIC, the 32 byte key of the source it was parsed from, then the pickled program
+MAGIC = b"KYLEC\x01"
+#bumped whenever a node class gains or loses a field, entries pickled with the old layout would load broken
+AST_FORMAT = 3
+#anything that changes how a source parses (or how nodes pickle) has to change the key
+VERSION_TAG = f"{COMPILER_VERSION}:{AST_FORMAT}:{sys.implementation.cache_tag}".encode()
+
+
+class TreePickler(pickle.Pickler):
+    #the line index points at the source (maybe an mmap), it is stored as a reference and rebuilt on load
+    def persistent_id(self, obj):
+        return "lines" if isinstance(obj, LineIndex) else None
+
+
+class TreeUnpickler(pickle.Unpickler):
+    def __init__(self, file, lines):
+        super().__init__(file)
+        self.lines = lines
+    def persistent_load(self, pid):
+        if pid != "lines":
+            raise pickle.UnpicklingError(f"unknown persistent id {pid!r}")
+        return self.lines
+
+
+class ASTCache:
+    """.pyc-style store of the parsed ProgramNode of one source file, in a single .kylec entry.
+
+    Like a hash-based .pyc, the entry is named after the source and starts
+    with a hash of it and the compiler version: an edited source or a new
+    compiler simply misses, and storing the new program replaces the entry,
+    so no source ever has more than one. Writes go through a temporary file
+    renamed into place, so concurrent runs sharing a directory only ever see
+    whole entries. Entries are pickles and loading one can run code, so the
+    directory must be as trusted as the sources.
+    """
+    def __init__(self, path, variant=""):
+        self.path = path
+        self.variant = variant #keeps programs parsed with different options (e.g. lazy function bodies) apart
+
+    @classmethod
+    def beside(cls, filename, variant=""):
+        """The cache of `filename` in __kylecache__ next to it (or under $KYLECACHEPREFIX), None while $KYLENOCACHE is set"""
+        if os.environ.get(NO_CACHE_VARIABLE):
+            return None
+        directory, name = os.path.split(os.path.abspath(filename))
+        prefix = os.environ.get(CACHE_PREFIX_VARIABLE)
+        if prefix:
+            directory = os.path.join(os.path.abspath(prefix), os.path.splitdrive(directory)[1].lstrip(os.sep))
+        else:
+            directory = os.path.join(directory, CACHE_DIRECTORY)
+        return cls(os.path.join(directory, f"{name}.{variant}{CACHE_EXTENSION}" if variant else name + CACHE_EXTENSION), variant)
+
+    def key(self, source):
+        digest = hashlib.sha256(VERSION_TAG + self.variant.encode())
+        digest.update(source.encode() if isinstance(source, str) else source)
+        return digest.digest()
+
+    def load(self, source, key=None):
+        """The cached ProgramNode for `source`, or None on a miss (or an unreadable entry)"""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = MAGIC + (key or self.key(source))
+        if not data.startswith(header):
+            return None #an entry for another version of the source
+        try:
+            return TreeUnpickler(io.BytesIO(data[len(header):]), LineIndex(source)).load()
+        except Exception: #a damaged or foreign entry is just a miss, the caller re-parses and overwrites it
+            return None
+
+    def store(self, program, source=None, key=None):
+        """Write `program` for `source` atomically over the previous entry, returns False when it could not be stored"""
+        key = key or self.key(source)
+        directory, name = os.path.split(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=directory, prefix=name, suffix=".tmp")
+        except OSError:
+            return False
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(MAGIC + key)
+                TreePickler(f, pickle.HIGHEST_PROTOCOL).dump(program)
+            os.replace(temporary, self.path)
+        except BaseException as e:
+            os.unlink(temporary)
+            #an unwritable disk or a tree nested too deep for pickle just goes uncached
+            if isinstance(e, (OSError, RecursionError)):
+                return False
+            raise
+        return True
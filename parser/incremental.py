@@ -0,0 +1,288 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import fields, is_dataclass
+from lexer import Lexer
+from type_decl.lexer_types import TokenType, Token, LineIndex
+from type_decl.parser_types import ProgramNode, ConstantPool
+from .parser import Parser
+
+
+#edits copy at most the blocks of text they touch, blocks are only split once they grow past twice this
+BLOCK_SIZE = 4096
+
+
+def offset_nodes(node):
+    """Every node (nested ones included) of a statement that carries an offset, collected once when it gets parsed"""
+    found, stack = [], [node]
+    #an explicit stack, statements can nest deeper than the recursion limit
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if isinstance(node, Token) or not hasattr(node, "offset"):
+            continue #tokens are shifted with the token list, literals carry no offset
+        if node.offset is not None:
+            found.append(node)
+        children = [getattr(node, f.name) for f in fields(node)] if is_dataclass(node) else list(vars(node).values())
+        stack.extend(child for child in reversed(children) if child is not None and not isinstance(child, (str, int, float)))
+    return found
+
+
+class PendingShift:
+    """An offset shift still owed to every entry of a list from index `gap` on.
+
+    An edit moves the gap to itself, shifting only the entries in between for
+    real, and adds its own delta: its cost follows the distance from the
+    previous edit rather than the length of everything after it.
+    """
+    __slots__ = ("apply", "gap", "delta")
+    def __init__(self, apply):
+        self.apply = apply #apply(start, stop, amount) shifts entries [start, stop) by amount
+        self.gap, self.delta = 0, 0
+    def value(self, index, stored):
+        return stored + self.delta if index >= self.gap else stored
+    def move(self, index):
+        if self.delta and index > self.gap:
+            self.apply(self.gap, index, self.delta)
+        elif self.delta and index < self.gap:
+            self.apply(index, self.gap, -self.delta)
+        self.gap = index
+    def replaced(self, stop, delta):
+        #the entries before `stop` were just replaced by real ones, the ones after them move by `delta` more
+        self.gap = stop
+        self.delta += delta
+    def settle(self, length):
+        self.move(length)
+        self.delta = 0
+
+
+class TextBlocks:
+    """The text of an edited buffer, kept as short blocks so an edit never copies the whole of it"""
+    def __init__(self, text):
+        self.blocks = [text[i:i + BLOCK_SIZE] for i in range(0, len(text), BLOCK_SIZE)] or [""]
+        self.starts = list(range(0, len(text), BLOCK_SIZE)) or [0]
+        self.shift = PendingShift(self.shift_starts)
+
+    def __str__(self):
+        return "".join(self.blocks)
+
+    def shift_starts(self, start, stop, amount):
+        starts = self.starts
+        for index in range(start, stop):
+            starts[index] += amount
+
+    def start(self, index):
+        return self.shift.value(index, self.starts[index])
+
+    def find(self, offset):
+        #the block holding `offset`, the last one for the very end of the text
+        return max(bisect_right(range(len(self.blocks)), offset, key=self.start) - 1, 0)
+
+    def replace(self, offset, deleted, inserted):
+        first, last = self.find(offset), self.find(offset + deleted)
+        base = self.start(first)
+        text = self.blocks[first][:offset - base] + inserted + self.blocks[last][offset + deleted - self.start(last):]
+        pieces = [text[i:i + BLOCK_SIZE] for i in range(0, len(text), BLOCK_SIZE)] if len(text) > 2 * BLOCK_SIZE else [text]
+        self.shift.move(last + 1)
+        self.blocks[first:last + 1] = pieces
+        starts = []
+        for piece in pieces:
+            starts.append(base)
+            base += len(piece)
+        self.starts[first:last + 1] = starts
+        self.shift.replaced(first + len(pieces), len(inserted) - deleted)
+
+    def read(self, offset):
+        """The text from `offset` to the end, one block at a time"""
+        index = self.find(offset)
+        yield self.blocks[index][offset - self.start(index):]
+        for index in range(index + 1, len(self.blocks)):
+            yield self.blocks[index]
+
+
+class BlockReader:
+    #file-like front for TextBlocks.read(), so the streaming lexer pulls only the blocks it gets to
+    def __init__(self, blocks):
+        self.blocks = blocks
+    def read(self, size=-1):
+        #an empty read means the end of the source to the lexer, blocks emptied by edits are skipped
+        return next((block for block in self.blocks if block), "")
+
+
+class DocumentLines(LineIndex):
+    """The LineIndex every token of a document shares, worked out from the current text on the first lookup after an edit"""
+    def __init__(self, document):
+        super().__init__("")
+        self.document = document
+        self.starts = None
+    def build(self):
+        self.source = self.document.source
+        super().build()
+    def feed(self, text, base, end):
+        pass #lexers re-scanning part of the document don't know its earlier lines, build() covers all of them
+    def invalidate(self):
+        self.starts = None
+
+
+class IncrementalDocument:
+    """Tokens and top-level statements of a buffer that keeps being edited.
+
+    edit() re-lexes only from the token before the edit up to the first token
+    that lines up again with the old stream, and re-parses only the top-level
+    statements that overlap the re-lexed tokens. Every other token and
+    ProgramNode.Toplevel entry is reused as is. Their offsets are shifted
+    lazily: an edit only settles the ones between it and the previous edit,
+    the rest are brought up to date when `program` is next asked for.
+
+    Illegal lexemes are skipped and reported in `diagnostics` instead of
+    stopping the lexer, their offsets follow the edits like everything
+    else (program.locate() turns them into line/column).
+    """
+    def __init__(self, source):
+        self.text = TextBlocks(source)
+        self.rebuild()
+
+    @property
+    def source(self):
+        return str(self.text)
+
+    def rebuild(self):
+        self.lines = DocumentLines(self)
+        lexer = Lexer(self.source, recover=True)
+        lexer.lines = self.lines
+        self.tokens = list(lexer.iter_tokens())
+        self.diagnostics = lexer.diagnostics
+        self.token_shift = PendingShift(self.shift_tokens)
+        #shared by every re-parse, so reused and re-parsed statements draw constants from one pool
+        self.constants = ConstantPool()
+        #per top-level statement: the index of its first token and the nodes whose offsets move with it
+        self.statements, self.starts, self.anchors = [], [], []
+        self.start_shift = PendingShift(self.shift_starts)
+        self.anchor_shift = PendingShift(self.shift_anchors)
+        self.stale = True #only cleared once the whole state is consistent with the text again
+        self.parse_from(0, 0, 0)
+        self.stale = False
+
+    def shift_tokens(self, start, stop, amount):
+        for token in self.tokens[start:stop]:
+            token.offset += amount
+
+    def shift_starts(self, start, stop, amount):
+        starts = self.starts
+        for index in range(start, stop):
+            starts[index] += amount
+
+    def shift_anchors(self, start, stop, amount):
+        for nodes in self.anchors[start:stop]:
+            for node in nodes:
+                node.offset += amount
+
+    def settle(self):
+        """Carry out every pending shift, all token and node offsets are real afterwards"""
+        self.token_shift.settle(len(self.tokens))
+        self.start_shift.settle(len(self.starts))
+        self.anchor_shift.settle(len(self.anchors))
+
+    @property
+    def program(self):
+        self.settle()
+        return ProgramNode(Toplevel=self.statements or None, lines=self.lines, constants=self.constants)
+
+    def edit(self, offset, deleted, inserted):
+        """Replace `deleted` characters at `offset` with `inserted`, `program` is the updated ProgramNode"""
+        self.text.replace(offset, deleted, inserted)
+        self.lines.invalidate()
+        if self.stale:
+            #a previous edit left the buffer unlexable/unparsable, nothing is left to reuse safely
+            return self.rebuild()
+        self.stale = True
+        delta = len(inserted) - deleted
+        tokens, token_shift = self.tokens, self.token_shift
+        token_offset = lambda index: token_shift.value(index, tokens[index].offset)
+        indexes = range(len(tokens))
+
+        #re-lex from the last token starting before the edit (it may grow into the edit)
+        first = bisect_left(indexes, offset, key=token_offset)
+        first, restart = (first - 1, token_offset(first - 1)) if first else (0, 0)
+        #until a new token starts exactly where a token from past the edit now sits
+        sync = bisect_left(indexes, offset + deleted, key=token_offset)
+        lexer = Lexer(BlockReader(self.text.read(restart)), recover=True)
+        #tokens and diagnostics come out with document offsets and are located through the document's lines
+        lexer.offset_base, lexer.lines = restart, self.lines
+        relexed = []
+        for token in lexer.iter_tokens():
+            while sync < len(tokens) and token_offset(sync) + delta < token.offset:
+                sync += 1
+            if sync < len(tokens) and token_offset(sync) + delta == token.offset:
+                break
+            relexed.append(token)
+        else:
+            sync = len(tokens)
+        #the diagnostics of the re-lexed text are replaced by the new ones, the ones past it move with the text
+        resumed = token_offset(sync) if sync < len(tokens) else float("inf")
+        before = [diagnostic for diagnostic in self.diagnostics if diagnostic.offset < restart]
+        after = [diagnostic for diagnostic in self.diagnostics if diagnostic.offset >= resumed]
+        for diagnostic in after:
+            diagnostic.offset += delta
+        self.diagnostics = before + lexer.diagnostics + after
+        token_shift.move(sync)
+        tokens[first:sync] = relexed
+        token_shift.replaced(first + len(relexed), delta)
+        index_delta = len(relexed) - (sync - first)
+
+        #re-parse from the statement holding the token before the re-lexed ones
+        starts, start_of = self.starts, lambda index: self.start_shift.value(index, self.starts[index])
+        statements = range(len(starts))
+        first_statement = max(bisect_right(statements, first - 1, key=start_of) - 1, 0)
+        cursor = start_of(first_statement) if starts else 0
+        reusable = bisect_left(statements, sync, key=start_of)
+        self.parse_from(first_statement, cursor, reusable, index_delta, delta)
+        self.stale = False
+
+    def parse_from(self, first_statement, cursor, reusable, index_delta=0, delta=0):
+        """Parse top-level statements from token `cursor` on, stopping early once the parser
+        lands on the start of a reusable old statement (statements[reusable:], shifted)"""
+        starts, start_shift = self.starts, self.start_shift
+        parser = Parser(self.tokens, constants=self.constants)
+        stream = parser.token_stream
+        stream.cursor = cursor
+        statements, new_starts, anchors = [], [], []
+        while stream.has_next() and stream.current().type != TokenType.RBRACE:
+            while reusable < len(starts) and start_shift.value(reusable, starts[reusable]) + index_delta < stream.cursor:
+                reusable += 1
+            if reusable < len(starts) and start_shift.value(reusable, starts[reusable]) + index_delta == stream.cursor:
+                break
+            start = stream.cursor
+            stmt = self.parse_statement(parser, start)
+            if stmt:
+                statements.append(stmt)
+                new_starts.append(start)
+                anchors.append(offset_nodes(stmt))
+        else:
+            reusable = len(starts)
+        start_shift.move(reusable)
+        self.anchor_shift.move(reusable)
+        self.statements[first_statement:reusable] = statements
+        starts[first_statement:reusable] = new_starts
+        self.anchors[first_statement:reusable] = anchors
+        start_shift.replaced(first_statement + len(statements), index_delta)
+        self.anchor_shift.replaced(first_statement + len(statements), delta)
+
+    def parse_statement(self, parser, start):
+        #the parser looks one token past where it stops at most: a statement that read tokens still owed
+        #a shift (their offsets end up in its nodes and errors) is parsed again once they got it
+        stream, shift = parser.token_stream, self.token_shift
+        while True:
+            stream.cursor = start
+            try:
+                stmt = parser.parse_next_statement()
+            except parser.Recoverable:
+                reach = min(stream.cursor + 2, len(self.tokens))
+                if reach <= shift.gap or not shift.delta:
+                    raise
+                shift.move(reach)
+                continue
+            reach = min(stream.cursor + 2, len(self.tokens))
+            if reach <= shift.gap or not shift.delta:
+                return stmt
+            shift.move(reach)
@@ -1,61 +1,232 @@
 from configurables.decl import *
 from type_decl.parser_types import *
-from util.facilitators import StreamIterator
+from util.facilitators import StreamIterator, LookaheadStream
+from type_decl.lexer_types import Token, Diagnostic
 
         
 
+#constants an iter_statements() parser interns before starting over with an empty pool
+STREAM_POOL_LIMIT = 1 << 16
+
+
 class Parser:
-    def __init__(self, token_stream, look_up_hash_map=None, type_look_up_reference=None):
+    #resolved once per class (see __init_subclass__ and the bottom of this module), never per instance
+    TypeReference = type_look_up_reference
+    errors = {"unterminated_assignment": Parser_extension_functions["errors"]["unterminated_assignment"]}
+    extensions = {"expected_next_tokens": Parser_extension_functions["Sentinel"]["expected_next_tokens"]}
+    Precedence = operator_precedence
+    dispatch = {} #TokenType -> unbound parse_* function
+    #what raise_error() throws, a recovering parser turns these into diagnostics
+    Recoverable = (ValueError, TypeError, RuntimeError)
+    ErrorKinds = {ValueError: "value error", TypeError: "type error", RuntimeError: "run time"}
+
+    def __init__(self, token_stream, look_up_hash_map=None, type_look_up_reference=None, constants=None, lazy_functions=False):
         self.data = token_stream
-        self.token_stream = StreamIterator(self.data)
-        self.lookup_table = self.get_parser_dispatch_hashmap()
-        self.TypeReference = self.get_type_look_up_reference()
-        self.errors = self.get_helper_functions("errors","unterminated_assignment")
-        self.extensions = self.get_helper_functions("Sentinel","expected_next_tokens")
+        #lazy parsers leave function bodies as token spans, parsed on the function's first call (see DeferredBody)
+        self.lazy_functions = lazy_functions
+        #literals and names are interned here so repeated constants share one node (pass a pool to keep adding to it)
+        self.constants = ConstantPool() if constants is None else constants
+        #token lists are walked in place, anything else (e.g. Lexer.iter_tokens()) is pulled lazily
+        #both streams park on the EOF token the lexer ends every token stream with, lookahead past it returns it again
+        self.token_stream = (
+            StreamIterator(self.ensure_eof(self.data), sentinel=True) if hasattr(self.data, "__getitem__")
+            else LookaheadStream(self.data, label="Lazy Token Stream", sentinel=True)
+        )
+        self.diagnostics = None #a list only while parse_all() recovers from errors
+        #custom tables are the only thing still resolved per instance
+        if look_up_hash_map is not None:
+            self.dispatch = self.compile_dispatch_table(look_up_hash_map)
+        if type_look_up_reference is not None:
+            self.TypeReference = type_look_up_reference
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.dispatch = cls.compile_dispatch_table()
+
+    @classmethod
+    def compile_dispatch_table(cls, table=None):
+        """Turn a TokenType -> method name table (parser_dispatch_table by default) into TokenType -> function"""
+        table = parser_dispatch_table if table is None else table
+        return {type: getattr(cls, name) for type, name in table.items() if hasattr(cls, name)}
     
-    def get_helper_functions(self, cls_=None, func_name=None):
-        if not func_name:raise ValueError(f"{func_name} not specified when calling self.get_helper_functions()")
-        if not cls_:cls_ = "errors"
-        return { 
-            f"{func_name}":globals()["Parser_extension_functions"][cls_][f"{func_name}"]
-        }
-    def get_parser_dispatch_hashmap(self):
-        return globals()["parser_dispatch_table"]
-
-    def get_type_look_up_reference(self):
-        return globals()["type_look_up_reference"]
+    @staticmethod
+    def ensure_eof(tokens):
+        #hand-built token lists may lack the EOF token, the lexer's never do
+        if len(tokens) and tokens[-1].type == TokenType.EOF:
+            return tokens
+        offset = getattr(tokens[-1], "offset", None) if len(tokens) else None
+        return [*tokens, Token(TokenType.EOF, "", offset)]
 
     def parse(self):
-        self.program = ProgramNode(Toplevel=self.start_descent_recursion())
+        #tokens share the line index of their source, the program keeps it to resolve node offsets later
+        lines = getattr(self.token_stream.current(), "lines", None)
+        self.program = ProgramNode(Toplevel=self.start_descent_recursion(), lines=lines, constants=self.constants)
         return self.program
+
+    def parse_all(self, diagnostics=None):
+        """Parse the whole stream, recovering from every error instead of stopping at the first.
+
+        Returns the (partial) ProgramNode of every statement that did parse and
+        the Diagnostics found, ordered by offset. Passing a recovering lexer's
+        `diagnostics` list reports both phases in one list.
+        """
+        self.diagnostics = [] if diagnostics is None else diagnostics
+        lines = getattr(self.token_stream.current(), "lines", None)
+        statements = []
+        while True:
+            statements.extend(self.start_descent_recursion() or ())
+            stray = self.token_stream.current()
+            if stray.type == TokenType.EOF:
+                break
+            #a '}' nothing opened, the top level keeps going past it
+            self.diagnostics.append(Diagnostic("value error", f"Unmatched '}}' {self.token_stream.return_formatted_state()}", stray.offset))
+            self.token_stream.next()
+        self.program = ProgramNode(Toplevel=statements or None, lines=lines, constants=self.constants)
+        self.diagnostics.sort(key=lambda diagnostic: -1 if diagnostic.offset is None else diagnostic.offset)
+        return self.program, self.diagnostics
     
+    def iter_statements(self, pool_limit=STREAM_POOL_LIMIT):
+        """Yield the top-level statements one at a time, as soon as each is parsed.
+
+        Nothing is kept once a statement is yielded: the constant pool is
+        emptied whenever it holds more than `pool_limit` entries, so memory
+        stays bounded however long the stream runs.
+        """
+        stream = self.token_stream
+        while stream.current().type != TokenType.EOF:
+            if stream.current().type in self.TypeReference["BLOCK_END"]:
+                #a '}' nothing opened, the statements after it must not be dropped silently
+                self.raise_error("value error", f"Unmatched '}}' {stream.return_formatted_state()}")
+            stmt = self.parse_next_statement()
+            if stmt:
+                yield stmt
+            if len(self.constants) + len(self.constants.names) > pool_limit:
+                self.constants.clear()
+
     def start_descent_recursion(self):
         statements = []
-        while self.token_stream.has_next():
-            # Stop if we hit a closing brace (end of block)
-            if self.token_stream.current().type == TokenType.RBRACE:
-                break
-            
-            next_parser = self.parser_dispatcher()
-            if next_parser:
-                stmt = next_parser()
-                if stmt and stmt != "lalal":
-                    statements.append(stmt)
-            else:
-                break
+        # Stop at a closing brace (end of block) or at the EOF token the stream parks on
+        while self.token_stream.current().type not in self.TypeReference["BLOCK_END"]:
+            stmt = self.parse_next_statement()
+            if stmt:
+                statements.append(stmt)
         return statements if statements else None
+
+    def parse_next_statement(self):
+        """Parse exactly one statement starting at the current token (incremental re-parsing drives this directly).
+
+        Block constructs (if, while, for, fun, switch) never parse their own
+        blocks: they parse up to the block and return a pending
+        (node, continuation) pair. The statements of the block are parsed
+        here, then continuation(node, run) finishes the node or opens its
+        next block. Runs ended by something other than '}' (for clauses, case
+        bodies) come as a (node, continuation, run_end) triple instead. Open
+        constructs live on an explicit stack, so nesting depth costs list
+        entries instead of Python frames.
+        """
+        stream = self.token_stream
+        block_end = self.TypeReference["BLOCK_END"]
+        dispatch = self.dispatch
+        frames = [] #open constructs, innermost last: (pending pair, cursor its statement started at, its run so far, what ends it)
+        start = stream.cursor
+        node = self.dispatch_statement(start)
+        while True:
+            if type(node) is tuple:
+                frames.append((node[:2], start, [], node[2] if len(node) > 2 else block_end))
+                node = None
+            elif not frames:
+                return node if node and node != "lalal" else None
+            #collect the innermost construct's run until a '}' (or EOF, or its own run end) ends it
+            _, _, statements, run_end = frames[-1]
+            if node and node != "lalal":
+                statements.append(node)
+            try:
+                while stream.current().type not in run_end:
+                    start = stream.cursor
+                    handler = dispatch.get(stream.current().type)
+                    node = handler(self) if handler else self.parser_dispatcher()()
+                    if type(node) is tuple:
+                        break
+                    if node and node != "lalal":
+                        statements.append(node)
+                else:
+                    node = None
+            except self.Recoverable as e:
+                if self.diagnostics is None:
+                    raise
+                node = self.recover(e, start)
+                continue
+            if node is not None:
+                continue #a nested construct opened its block
+            (pending, continuation), start, statements, _ = frames.pop()
+            try:
+                node = continuation(pending, statements or None)
+            except self.Recoverable as e:
+                if self.diagnostics is None:
+                    raise
+                node = self.recover(e, start)
+
+    def dispatch_statement(self, start):
+        #a finished node, or a block construct's pending (node, continuation) pair
+        try:
+            handler = self.dispatch.get(self.token_stream.current().type)
+            return handler(self) if handler else self.parser_dispatcher()()
+        except self.Recoverable as e:
+            if self.diagnostics is None:
+                raise
+            return self.recover(e, start)
+
+    def recover(self, error, start):
+        #the statement that started at `start` failed: report it and skip past it
+        self.diagnostics.append(self.diagnose(error))
+        self.synchronize(start)
+        return None
+
+    def diagnose(self, error):
+        expected = self.extensions["expected_next_tokens"](self)
+        return Diagnostic(
+            self.ErrorKinds.get(type(error), "run time"), str(error), self.token_stream.current().offset,
+            [type for type in expected if isinstance(type, TokenType)],
+        )
+
+    def synchronize(self, start):
+        """Skip to the next token a statement can start at, stepping over whole {} blocks.
+
+        Stops in front of the '}' closing the block being recovered in (or EOF),
+        so the enclosing construct still gets to consume it.
+        """
+        stream = self.token_stream
+        if stream.cursor == start:
+            stream.next() #the statement failed on its first token, never retry it
+        depth = 0
+        while True:
+            tok = stream.current()
+            if tok.type == TokenType.EOF:
+                return
+            if tok.type == TokenType.RBRACE:
+                if not depth:
+                    return
+                depth -= 1
+            elif tok.type == TokenType.LBRACE:
+                depth += 1
+            elif not depth and (
+                tok.type in self.TypeReference["STATEMENT_KEYWORDS"]
+                or tok.type == TokenType.IDENTIFIER and stream.peek().type in (TokenType.ASSIGNMENT, TokenType.LPAREN)
+            ):
+                return
+            stream.next()
     
     def parser_dispatcher(self,tok=None):
         tok = tok if tok else self.token_stream.current()
-        parser_name = self.lookup_table.get(tok.type.value,None)
-        if not parser_name:
+        handler = self.dispatch.get(tok.type)
+        if handler:
+            return handler.__get__(self)
+        #only the error path is left to work out why there is no handler
+        if tok.type not in parser_dispatch_table:
             raise ValueError(f"the 'Parser' is unfamiliar with the type of\n {self.token_stream.return_formatted_state()}")
-        parser_reference = getattr(self, parser_name, None)
-        return parser_reference if parser_reference else (
-            self.raise_error(
-                "value error",f"No parser method named '{parser_name}' exists !\n"
-                f"Error while trying to parse {self.token_stream.return_formatted_state()}"
-            )
+        self.raise_error(
+            "value error",f"No parser method named '{parser_dispatch_table[tok.type]}' exists !\n"
+            f"Error while trying to parse {self.token_stream.return_formatted_state()}"
         )
     
     def raise_error(self,err_type="run time",msg="Default Message To Halt Execution On Panic()"):
@@ -72,9 +243,8 @@ class Parser:
         curr = self.token_stream.current()
         match curr.type:
             case TokenType.IDENTIFIER:
-                try:
-                    peeked = self.token_stream.peek() 
-                except StopIteration:
+                peeked = self.token_stream.peek() #out-of-range lookahead lands on the EOF token, nothing to catch
+                if peeked.type == TokenType.EOF:
                     raise ValueError(
                         f"Syntax Error {self.token_stream.return_formatted_state()}"
                         "Doesnt Have lvalue"
@@ -97,17 +267,16 @@ class Parser:
                     "is not a statment"
                 )
     def parse_assignment(self):
-        try:
-            previous = self.token_stream.peek_back()#get LHS
-            self.token_stream.next()#commit the "=" EQUAL token: curr token will be rhs now
-        except:
+        if not self.token_stream.cursor:
             raise ValueError(
                 "Can Assign To Nothing buddy: gimmi something from the Left"
                 f"{self.token_stream.return_formatted_state()}"
             )
+        previous = self.token_stream.peek_back()#get LHS
+        self.token_stream.next()#commit the "=" EQUAL token: curr token will be rhs now
        
         if previous.type == TokenType.IDENTIFIER:
-            rvalue = self.parse_expression()#get rhs
+            rvalue = self.parse_expression()#get rhs, consumed: the curr token of the iterator will be whatever is next to the rhs
             # Handle both literal nodes and string expressions
             if hasattr(rvalue, 'type') and rvalue.type not in self.TypeReference["LITERALS"]:
                 raise TypeError(
@@ -115,393 +284,382 @@ class Parser:
                     "Expected an Expression or a Literal found"
                     f"{repr(rvalue.value)} which has a type of {rvalue.type}"
                 )
-            # Extract the actual value from the expression result
-            if hasattr(rvalue, 'value'):
-                actual_value = rvalue.value
-                actual_type = rvalue.type
-            else:
-                actual_value = rvalue
-                actual_type = TokenType.STRING_LITERAL if isinstance(rvalue, str) else TokenType.INTEGER
-            self.token_stream.next()#commit/consume rhs now the curr char of the iterator will be whatever is next to the rhs
-            return AssignmentNode(lvalue=previous,lvalue_type=previous.type, rvalue=actual_value, rvalue_type=actual_type)
+            #the name is interned like every other identifier, literals stay the pooled node
+            return AssignmentNode(lhs=self.constants.name(previous.value), rhs=rvalue, offset=previous.offset)
         else:
             raise TypeError(f"Assigning To Non Identifier \n{self.token_stream.return_formatted_state()}")
 
     def parse_condition(self):
-        # Parse a complete condition expression (e.g., "age >= 18")
-        left = self.parse_expression()
-        self.token_stream.next()  # consume the left operand
-        
-        # Check if there's a comparison operator
-        if (self.token_stream.has_next() and 
-            self.token_stream.current().type in [TokenType.GREATER, TokenType.LESS, TokenType.GREATER_EQUAL, 
-                                              TokenType.LESS_EQUAL, TokenType.EQUAL, TokenType.NOT_EQUAL]):
+        # Conditions are ordinary expressions (e.g. "age >= 18" comes back as a CompareNode)
+        return self.parse_expression()
+
+    def parse_expression(self, min_precedence=0):
+        """Precedence climbing over the binary operators in operator_precedence.
+
+        Consumes the whole expression and returns its operand (a literal node,
+        an identifier name or a call) or a BinaryOpNode/CompareNode tree.
+        Operators of equal precedence associate to the left.
+        """
+        left = self.parse_operand()
+        while True:
             operator = self.token_stream.current()
+            precedence = self.Precedence.get(operator.type)
+            if precedence is None or precedence < min_precedence:
+                return left
             self.token_stream.next()  # consume operator
-            right = self.parse_expression()
-            self.token_stream.next()  # consume right operand
-            return f"Comparison({left} {operator.value} {right})"
-        else:
-            return left
+            right = self.parse_expression(precedence + 1)
+            node = CompareNode if operator.type in self.TypeReference["COMPARISONS"] else BinaryOpNode
+            left = node(op=operator.type, left=left, right=right, offset=operator.offset)
 
-    def parse_expression(self):
+    def parse_operand(self):
         curr = self.token_stream.current()
-        if not curr:self.raise_error("value error",
+        if curr.type == TokenType.EOF:self.raise_error("value error",
             f'{self.errors["unterminated_assignment"](self)}'
         )
         
-        # Handle simple expressions: literal, identifier, or comparison
+        # Handle simple operands: literal, identifier, call, unary minus or a parenthesized expression
         if curr.type in self.TypeReference["LITERALS"]:
-            if curr.type == TokenType.STRING_LITERAL:
-                return StringNode(value=curr.value)
-            elif curr.type == TokenType.INTEGER:
-                return IntegerNode(value=curr.value)
-            elif curr.type == TokenType.FLOAT_LITERAL:
-                return FloatNode(value=curr.value)
+            self.token_stream.next()  # consume the literal
+            return self.constants.literal(curr.type, curr.value)
         elif curr.type == TokenType.IDENTIFIER:
-            # Just return the identifier value
-            return curr.value
+            if self.token_stream.peek().type == TokenType.LPAREN:
+                return self.parse_function_call()
+            self.token_stream.next()  # consume the identifier
+            # Identifiers stay plain names, the interpreter resolves them
+            return self.constants.name(curr.value)
+        elif curr.type == TokenType.MINUS:
+            self.token_stream.next()  # consume '-'
+            return UnaryOpNode(op=curr.type, operand=self.parse_operand(), offset=curr.offset)
+        elif curr.type == TokenType.LPAREN:
+            self.token_stream.next()  # consume '('
+            expression = self.parse_expression()
+            if self.token_stream.current().type != TokenType.RPAREN:
+                self.raise_error("value error", "Expected ')' to close expression")
+            self.token_stream.next()  # consume ')'
+            return expression
         else:
             raise RuntimeError(
                 f"Expressions of type {curr.type} are not implemented yet"
             )
 
     def parse_function(self):
-        self.token_stream.next()  # consume 'fun'
+        offset = self.token_stream.next().offset  # consume 'fun'
         
         # Parse function name
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.IDENTIFIER:
+        if self.token_stream.current().type != TokenType.IDENTIFIER:
             self.raise_error("value error", "Expected function name after 'fun'")
         
-        func_name = self.token_stream.current().value
+        func_name = self.constants.name(self.token_stream.current().value)
         self.token_stream.next()  # consume function name
         
         # Parse parameters
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after function name")
         
         self.token_stream.next()  # consume '('
         params = []
         
         # Parse parameter list
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RPAREN:
+        while self.token_stream.current().type not in self.TypeReference["GROUP_END"]:
             if self.token_stream.current().type == TokenType.IDENTIFIER:
-                params.append(self.token_stream.current().value)
+                params.append(self.constants.name(self.token_stream.current().value))
                 self.token_stream.next()
                 
                 # Check for comma separator
-                if self.token_stream.has_next() and self.token_stream.current().type == TokenType.COMMA:
+                if self.token_stream.current().type == TokenType.COMMA:
                     self.token_stream.next()
             else:
                 self.raise_error("value error", "Expected parameter name in function definition")
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' to close parameter list")
         
         self.token_stream.next()  # consume ')'
         
-        # Parse function body
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-            self.raise_error("value error", "Expected '{' to start function body")
-        
+        # The body is parsed by parse_next_statement(), which then hands it to close_function_body()
+        self.open_block("function")
+        if self.lazy_functions:
+            return FunctionNode(name=func_name, params=params, body=None, offset=offset, deferred=self.skip_block())
+        return FunctionNode(name=func_name, params=params, body=None, offset=offset), self.close_function_body
+
+    def skip_block(self):
+        """Step over a block by brace matching alone (its '{' already consumed) and return it as a DeferredBody"""
+        stream = self.token_stream
+        if isinstance(stream, StreamIterator):
+            #in place: the span is found straight off the token list, then only it is kept (and cached) with the body
+            tokens, start = stream.data, stream.cursor
+            depth, cursor = 1, start
+            while cursor < stream.end:
+                kind = tokens[cursor].type
+                if kind == TokenType.RBRACE:
+                    depth -= 1
+                    if not depth:
+                        break
+                elif kind == TokenType.LBRACE:
+                    depth += 1
+                cursor += 1
+            stream.cursor = cursor
+            tokens, start = tokens[start:cursor + 1], 0
+        else:
+            #pulled lazily: the body's tokens have to be kept, up to and including its '}'
+            tokens, start, depth = [], 0, 1
+            while stream.current().type != TokenType.EOF:
+                tok = stream.current()
+                tokens.append(tok)
+                if tok.type == TokenType.RBRACE:
+                    depth -= 1
+                    if not depth:
+                        break
+                elif tok.type == TokenType.LBRACE:
+                    depth += 1
+                stream.next()
+        self.close_block("function", None)
+        return DeferredBody(type(self), tokens, start, self.constants)
+
+    def close_function_body(self, node, run):
+        node.body = self.close_block("function", run)
+        return node
+
+    def open_block(self, construct):
+        if self.token_stream.current().type != TokenType.LBRACE:
+            self.raise_error("value error", f"Expected '{{' to start {construct} body")
         self.token_stream.next()  # consume '{'
-        
-        body = []
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-            stmt = self.start_descent_recursion()
-            if stmt:
-                body.append(stmt)
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-            self.raise_error("value error", "Expected '}' to close function body")
-        
+
+    def close_block(self, construct, run):
+        if self.token_stream.current().type != TokenType.RBRACE:
+            self.raise_error("value error", f"Expected '}}' to close {construct} body")
         self.token_stream.next()  # consume '}'
-        
-        return FunctionNode(name=func_name, params=params, body=body)
+        return [run] if run else []
 
     def parse_if_statement(self):
-        self.token_stream.next()  # consume 'if'
+        offset = self.token_stream.next().offset  # consume 'if'
         
         # Parse condition
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after 'if'")
         
         self.token_stream.next()  # consume '('
         condition = self.parse_condition()
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' after if condition")
         
         self.token_stream.next()  # consume ')'
         
-        # Parse then branch
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-            self.raise_error("value error", "Expected '{' to start if body")
-        
-        self.token_stream.next()  # consume '{'
-        
-        then_branch = []
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-            stmt = self.start_descent_recursion()
-            if stmt:
-                then_branch.append(stmt)
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-            self.raise_error("value error", "Expected '}' to close if body")
-        
-        self.token_stream.next()  # consume '}'
+        self.open_block("if")
+        return IfNode(condition=condition, then_branch=None, offset=offset), self.close_if_body
+
+    def close_if_body(self, node, run):
+        node.then_branch = self.close_block("if", run)
         
         # Parse else branch (otherwise)
-        else_branch = None
-        if (self.token_stream.has_next() and 
-            self.token_stream.current().type == TokenType.OTHERWISE):
-            
+        if self.token_stream.current().type == TokenType.OTHERWISE:
             self.token_stream.next()  # consume 'otherwise'
-            
-            if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-                self.raise_error("value error", "Expected '{' to start otherwise body")
-            
-            self.token_stream.next()  # consume '{'
-            
-            else_branch = []
-            while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-                stmt = self.start_descent_recursion()
-                if stmt:
-                    else_branch.append(stmt)
-            
-            if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-                self.raise_error("value error", "Expected '}' to close otherwise body")
-            
-            self.token_stream.next()  # consume '}'
-        
-        return IfNode(condition=condition, then_branch=then_branch, else_branch=else_branch)
+            self.open_block("otherwise")
+            return node, self.close_otherwise_body
+        return node
+
+    def close_otherwise_body(self, node, run):
+        node.else_branch = self.close_block("otherwise", run)
+        return node
 
     def parse_function_call(self):
         # Parse function call like builtin_print("message")
-        func_name = self.token_stream.current().value
-        self.token_stream.next()  # consume function name
+        func_name = self.constants.name(self.token_stream.current().value)
+        offset = self.token_stream.next().offset  # consume function name
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after function name")
         
         self.token_stream.next()  # consume '('
         args = []
         
         # Parse arguments
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RPAREN:
+        while self.token_stream.current().type not in self.TypeReference["GROUP_END"]:
             arg = self.parse_expression()
             args.append(arg)
-            self.token_stream.next()  # consume the argument
             
             # Check for comma separator
-            if self.token_stream.has_next() and self.token_stream.current().type == TokenType.COMMA:
+            if self.token_stream.current().type == TokenType.COMMA:
                 self.token_stream.next()  # consume comma
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' to close function call")
         
         self.token_stream.next()  # consume ')'
         
-        return FunctionCallNode(name=func_name, args=args)
+        return FunctionCallNode(name=func_name, args=args, offset=offset)
 
     def parse_while_statement(self):
-        self.token_stream.next()  # consume 'while'
+        offset = self.token_stream.next().offset  # consume 'while'
         
         # Parse condition
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after 'while'")
         
         self.token_stream.next()  # consume '('
         condition = self.parse_expression()
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' after while condition")
         
         self.token_stream.next()  # consume ')'
         
-        # Parse body
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-            self.raise_error("value error", "Expected '{' to start while body")
-        
-        self.token_stream.next()  # consume '{'
-        
-        body = []
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-            stmt = self.start_descent_recursion()
-            if stmt:
-                body.append(stmt)
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-            self.raise_error("value error", "Expected '}' to close while body")
-        
-        self.token_stream.next()  # consume '}'
-        
-        return WhileNode(condition=condition, body=body)
+        self.open_block("while")
+        return WhileNode(condition=condition, body=None, offset=offset), self.close_while_body
+
+    def close_while_body(self, node, run):
+        node.body = self.close_block("while", run)
+        return node
 
     def parse_for_statement(self):
-        self.token_stream.next()  # consume 'for'
+        offset = self.token_stream.next().offset  # consume 'for'
         
         # Parse for loop structure
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after 'for'")
         
         self.token_stream.next()  # consume '('
         
-        # Parse initialization
-        init = None
-        if self.token_stream.has_next() and self.token_stream.current().type != TokenType.SEMICOLON:
-            init = self.start_descent_recursion()
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.SEMICOLON:
+        # Parse initialization (a run of statements, parsed like a block up to the ';')
+        node = ForNode(init=None, condition=None, increment=None, body=None, offset=offset)
+        if self.token_stream.current().type not in self.TypeReference["STATEMENT_END"]:
+            return node, self.close_for_init, self.TypeReference["STATEMENT_END"]
+        return self.close_for_init(node, None)
+
+    def close_for_init(self, node, run):
+        node.init = run
+        if self.token_stream.current().type != TokenType.SEMICOLON:
             self.raise_error("value error", "Expected ';' after for loop initialization")
         
         self.token_stream.next()  # consume ';'
         
         # Parse condition
-        condition = None
-        if self.token_stream.has_next() and self.token_stream.current().type != TokenType.SEMICOLON:
-            condition = self.parse_expression()
+        if self.token_stream.current().type not in self.TypeReference["STATEMENT_END"]:
+            node.condition = self.parse_expression()
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.SEMICOLON:
+        if self.token_stream.current().type != TokenType.SEMICOLON:
             self.raise_error("value error", "Expected ';' after for loop condition")
         
         self.token_stream.next()  # consume ';'
         
-        # Parse increment
-        increment = None
-        if self.token_stream.has_next() and self.token_stream.current().type != TokenType.RPAREN:
-            increment = self.start_descent_recursion()
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        # Parse increment (up to the ')')
+        if self.token_stream.current().type not in self.TypeReference["GROUP_END"]:
+            return node, self.close_for_increment, self.TypeReference["GROUP_END"]
+        return self.close_for_increment(node, None)
+
+    def close_for_increment(self, node, run):
+        node.increment = run
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' after for loop increment")
         
         self.token_stream.next()  # consume ')'
         
-        # Parse body
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-            self.raise_error("value error", "Expected '{' to start for body")
-        
-        self.token_stream.next()  # consume '{'
-        
-        body = []
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-            stmt = self.start_descent_recursion()
-            if stmt:
-                body.append(stmt)
-        
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-            self.raise_error("value error", "Expected '}' to close for body")
-        
-        self.token_stream.next()  # consume '}'
-        
-        return ForNode(init=init, condition=condition, increment=increment, body=body)
+        self.open_block("for")
+        return node, self.close_for_body
+
+    def close_for_body(self, node, run):
+        node.body = self.close_block("for", run)
+        return node
 
     def parse_return_statement(self):
-        self.token_stream.next()  # consume 'return'
+        offset = self.token_stream.next().offset  # consume 'return'
         
         value = None
-        if (self.token_stream.has_next() and 
-            self.token_stream.current().type in self.TypeReference["LITERALS"]):
+        # an identifier followed by '=' is the next statement, not the returned value
+        if (self.token_stream.current().type in self.TypeReference["OPERANDS"] and
+            self.token_stream.peek().type != TokenType.ASSIGNMENT):
             value = self.parse_expression()
         
-        return ReturnNode(value=value)
+        return ReturnNode(value=value, offset=offset)
 
     def parse_goto_statement(self):
-        self.token_stream.next()  # consume 'goto'
+        offset = self.token_stream.next().offset  # consume 'goto'
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.IDENTIFIER:
+        if self.token_stream.current().type != TokenType.IDENTIFIER:
             self.raise_error("value error", "Expected label identifier after 'goto'")
         
         label = self.token_stream.current().value
         self.token_stream.next()  # consume label
         
-        return GotoNode(label=label)
+        return GotoNode(label=label, offset=offset)
 
     def parse_bailout_statement(self):
-        self.token_stream.next()  # consume 'bailout'
-        return ReturnNode(value=None)  # bailout is like return without value
+        offset = self.token_stream.next().offset  # consume 'bailout'
+        return ReturnNode(value=None, offset=offset)  # bailout is like return without value
 
     def parse_break_statement(self):
-        self.token_stream.next()  # consume 'break'
-        return BreakNode()
+        offset = self.token_stream.next().offset  # consume 'break'
+        return BreakNode(offset=offset)
 
     def parse_continue_statement(self):
-        self.token_stream.next()  # consume 'continue'
-        return ContinueNode()
+        offset = self.token_stream.next().offset  # consume 'continue'
+        return ContinueNode(offset=offset)
 
     def parse_switch_statement(self):
-        self.token_stream.next()  # consume 'switch'
+        offset = self.token_stream.next().offset  # consume 'switch'
         
         # Parse expression
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LPAREN:
+        if self.token_stream.current().type != TokenType.LPAREN:
             self.raise_error("value error", "Expected '(' after 'switch'")
         
         self.token_stream.next()  # consume '('
         expression = self.parse_expression()
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RPAREN:
+        if self.token_stream.current().type != TokenType.RPAREN:
             self.raise_error("value error", "Expected ')' after switch expression")
         
         self.token_stream.next()  # consume ')'
         
-        # Parse switch body
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.LBRACE:
-            self.raise_error("value error", "Expected '{' to start switch body")
-        
-        self.token_stream.next()  # consume '{'
-        
-        cases = []
-        default_case = None
-        
-        while self.token_stream.has_next() and self.token_stream.current().type != TokenType.RBRACE:
-            if (self.token_stream.current().type == TokenType.KEYWORD and 
-                self.token_stream.current().value == "case"):
-                
-                self.token_stream.next()  # consume 'case'
+        self.open_block("switch")
+        return self.parse_switch_cases(SwitchNode(expression=expression, cases=[], offset=offset))
+
+    def parse_switch_cases(self, node):
+        # Every case/default body is a run of statements handed back here once parsed
+        while self.token_stream.current().type not in self.TypeReference["BLOCK_END"]:
+            if self.token_stream.current().type == TokenType.CASE:
+                offset = self.token_stream.next().offset  # consume 'case'
                 
                 # Parse case value
-                if not self.token_stream.has_next():
+                if self.token_stream.current().type == TokenType.EOF:
                     self.raise_error("value error", "Expected case value")
                 
-                case_value = self.parse_expression()
-                
-                # Parse case body
-                body = []
-                while (self.token_stream.has_next() and 
-                       self.token_stream.current().type != TokenType.RBRACE and
-                       not (self.token_stream.current().type == TokenType.KEYWORD and 
-                            self.token_stream.current().value in ["case", "default"])):
-                    stmt = self.start_descent_recursion()
-                    if stmt:
-                        body.append(stmt)
-                
-                cases.append(CaseNode(value=case_value, body=body))
-                
-            elif (self.token_stream.current().type == TokenType.KEYWORD and 
-                  self.token_stream.current().value == "default"):
+                node.cases.append(CaseNode(value=self.parse_expression(), body=[], offset=offset))
+                if not self.at_case_end():
+                    return node, self.close_case_body, self.TypeReference["CASE_END"]
                 
+            elif self.token_stream.current().type == TokenType.DEFAULT:
                 self.token_stream.next()  # consume 'default'
                 
-                # Parse default body
-                default_case = []
-                while (self.token_stream.has_next() and 
-                       self.token_stream.current().type != TokenType.RBRACE):
-                    stmt = self.start_descent_recursion()
-                    if stmt:
-                        default_case.append(stmt)
+                node.default_case = []
+                if not self.at_case_end():
+                    return node, self.close_default_body, self.TypeReference["CASE_END"]
             else:
                 self.raise_error("value error", "Expected 'case' or 'default' in switch body")
         
-        if not self.token_stream.has_next() or self.token_stream.current().type != TokenType.RBRACE:
-            self.raise_error("value error", "Expected '}' to close switch body")
-        
-        self.token_stream.next()  # consume '}'
-        
-        return SwitchNode(expression=expression, cases=cases, default_case=default_case)
+        self.close_block("switch", None)
+        return node
+
+    def at_case_end(self):
+        return self.token_stream.current().type in self.TypeReference["CASE_END"]
+
+    def close_case_body(self, node, run):
+        if run:
+            node.cases[-1].body.append(run)
+        return self.parse_switch_cases(node)
+
+    def close_default_body(self, node, run):
+        if run:
+            node.default_case.append(run)
+        return self.parse_switch_cases(node)
+
     def parse_case_statement(self):
         # This should never be called directly - cases are handled in parse_switch_statement
         self.raise_error("value error", "'case' statements should only appear within switch statements")
 
     def parse_default_statement(self):
         # This should never be called directly - default is handled in parse_switch_statement
-        self.raise_error("value error", "'default' statements should only appear within switch statements")
\ No newline at end of file
+        self.raise_error("value error", "'default' statements should only appear within switch statements")
+
+
+Parser.dispatch = Parser.compile_dispatch_table()
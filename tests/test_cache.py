@@ -0,0 +1,68 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+from lexer.lexer import Lexer
+from parser import ASTCache, Parser
+from parser.cache import NO_CACHE_VARIABLE, CACHE_PREFIX_VARIABLE
+
+
+SOURCE = "fun twice(n) {\n return n * 2\n}\nx = twice(21)\n"
+
+
+def parse(source, lazy_functions=False):
+    return Parser(Lexer(source).iter_tokens(), lazy_functions=lazy_functions).parse()
+
+def entries(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+@mock.patch.dict(os.environ, {NO_CACHE_VARIABLE: "", CACHE_PREFIX_VARIABLE: ""})
+class ASTCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "twice.kyle")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged_source_hits(self):
+        cache = ASTCache.beside(self.filename)
+        self.assertIsNone(cache.load(SOURCE))
+        self.assertTrue(cache.store(parse(SOURCE), SOURCE))
+        self.assertEqual(repr(cache.load(SOURCE).Toplevel), repr(parse(SOURCE).Toplevel))
+
+    def test_edited_source_misses_and_replaces_the_entry(self):
+        cache = ASTCache.beside(self.filename)
+        edited = SOURCE.replace("21", "22")
+        cache.store(parse(SOURCE), SOURCE)
+        self.assertIsNone(cache.load(edited))
+        cache.store(parse(edited), edited)
+        self.assertIsNone(cache.load(SOURCE))
+        self.assertEqual(repr(cache.load(edited).Toplevel), repr(parse(edited).Toplevel))
+        #one entry per source, however often it is edited
+        self.assertEqual(entries(self.directory.name), ["twice.kyle.kylec"])
+
+    def test_variants_are_kept_apart(self):
+        ASTCache.beside(self.filename).store(parse(SOURCE), SOURCE)
+        self.assertIsNone(ASTCache.beside(self.filename, "lazy").load(SOURCE))
+
+    def test_opt_out(self):
+        with mock.patch.dict(os.environ, {NO_CACHE_VARIABLE: "1"}):
+            self.assertIsNone(ASTCache.beside(self.filename))
+
+    def test_prefix_moves_entries_out_of_the_source_directory(self):
+        with tempfile.TemporaryDirectory() as prefix, mock.patch.dict(os.environ, {CACHE_PREFIX_VARIABLE: prefix}):
+            ASTCache.beside(self.filename).store(parse(SOURCE), SOURCE)
+            self.assertEqual(entries(prefix), ["twice.kyle.kylec"])
+        self.assertEqual(entries(self.directory.name), [])
+
+    def test_deferred_bodies_keep_only_their_own_tokens(self):
+        function = parse(SOURCE, lazy_functions=True).Toplevel[0]
+        self.assertEqual([token.value for token in function.deferred.tokens], ["return", "n", "*", 2, "}"])
+        self.assertEqual(repr(pickle.loads(pickle.dumps(function.deferred)).parse()), repr(parse(SOURCE).Toplevel[0].body))
+
+
+if __name__ == "__main__":
+    unittest.main()
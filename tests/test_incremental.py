@@ -0,0 +1,66 @@
+import unittest
+from lexer.lexer import Lexer
+from parser import IncrementalDocument, Parser
+from parser.incremental import offset_nodes
+
+
+SOURCE = 'name = "george"\nage = 21\n\nif (age >= 18){\n    builtin_print("You are an adult")\n}\n' * 200
+
+
+class CountingDocument(IncrementalDocument):
+    def shift_tokens(self, start, stop, amount):
+        self.shifted += stop - start
+        super().shift_tokens(start, stop, amount)
+
+
+class IncrementalDocumentTest(unittest.TestCase):
+    def assertMatchesFreshParse(self, document):
+        program = document.program
+        fresh = Parser(Lexer(document.source, recover=True).iter_tokens()).parse()
+        self.assertEqual(repr(program.Toplevel), repr(fresh.Toplevel))
+        self.assertEqual([token.offset for token in document.tokens], [token.offset for token in Lexer(document.source, recover=True).iter_tokens()])
+        nodes = lambda toplevel: [node.offset for statement in toplevel for node in offset_nodes(statement)]
+        self.assertEqual(nodes(program.Toplevel), nodes(fresh.Toplevel))
+
+    def test_edits_match_a_fresh_parse(self):
+        document = IncrementalDocument(SOURCE)
+        at = SOURCE.index("age = 21", 4000) + 7
+        for index, digit in enumerate("98765"):
+            document.edit(at + index, 0, digit)
+        document.edit(8, 6, "")
+        document.edit(len(document.source), 0, "x = 1\n")
+        document.edit(document.source.index("age = 2987651") + 7, 3, "")
+        self.assertMatchesFreshParse(document)
+
+    def test_typing_only_shifts_tokens_between_edits(self):
+        document = CountingDocument(SOURCE)
+        document.shifted = 0
+        at = SOURCE.index("age = 21", len(SOURCE) // 2) + 7
+        for index, digit in enumerate("1234567890"):
+            document.edit(at + index, 0, digit)
+        #the tokens after the cursor are owed the shift but never touched while typing
+        self.assertLess(document.shifted, 50)
+        self.assertMatchesFreshParse(document)
+
+    def test_illegal_character_is_reported_not_fatal(self):
+        document = IncrementalDocument("a = 1\n")
+        document.edit(5, 0, " @")
+        self.assertEqual([(diagnostic.kind, diagnostic.offset) for diagnostic in document.diagnostics], [("illegal symbol", 6)])
+        self.assertIn("line 1 col 7", document.diagnostics[0].message)
+        self.assertEqual(repr(document.program.Toplevel), repr(Parser(Lexer("a = 1\n").iter_tokens()).parse().Toplevel))
+
+    def test_edits_stay_incremental_while_a_diagnostic_stands(self):
+        document = IncrementalDocument(SOURCE)
+        document.edit(len(SOURCE) // 2, 0, "@")
+        document.rebuild = None #any further full rebuild fails the test
+        document.edit(0, 0, "x = 2\n")
+        at = document.source.index("age = 21", len(SOURCE) // 2) + 7
+        for index, digit in enumerate("345"):
+            document.edit(at + index, 0, digit)
+        self.assertEqual([diagnostic.offset for diagnostic in document.diagnostics], [len(SOURCE) // 2 + 6])
+        self.assertEqual(document.program.locate(document.diagnostics[0]), Lexer(document.source, recover=True).lines.locate(len(SOURCE) // 2 + 6))
+        self.assertMatchesFreshParse(document)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import sys
+import unittest
+from contextlib import redirect_stdout
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from Semantics import BACKENDS
+
+
+DOWN = "fun down(n) {\n if (n > 0) {\n return down(n - 1)\n }\n return n\n}\n"
+
+
+def run(source, backend="interpreter"):
+    return BACKENDS[backend]().interpret(Parser(Lexer(source).iter_tokens()).parse())
+
+
+class RecursionDepthTest(unittest.TestCase):
+    def setUp(self):
+        self.limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(1000)
+
+    def tearDown(self):
+        sys.setrecursionlimit(self.limit)
+
+    def test_recursive_kyle_functions_reach_100_calls_deep(self):
+        #each Kyle call costs a fixed number of Python frames, dispatch must not add to them
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(run(DOWN + "down(100)\n", backend), [0])
+
+
+class GotoTest(unittest.TestCase):
+    def test_goto_is_a_language_error(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaisesRegex(ValueError, "no labels"):
+                    run("goto end\n", backend)
+
+
+
+class ForSwitchTest(unittest.TestCase):
+    SOURCE = (
+        "total = 0\n"
+        "for (i = 0; i < 6; i = i + 1) {\n"
+        "    switch (i) {\n"
+        "        case 1\n"
+        "            total = total + 10\n"
+        "        case 2\n"
+        "            total = total + 20\n"
+        "            break\n"
+        "            total = 1000\n"
+        "        default\n"
+        "            total = total + 1\n"
+        "    }\n"
+        "}\n"
+        "for (; total < 40; ) {\n"
+        "    total = total + 5\n"
+        "}\n"
+        "builtin_print(total)\n"
+    )
+
+    def test_for_and_switch_run_alike_on_every_backend(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    run(self.SOURCE, backend)
+                self.assertEqual(output.getvalue(), "44\n")
+
+
+def nested_loops(depth, kind):
+    """`depth` loops of two passes in a function, the innermost returns from all of them on its 1000th pass"""
+    loops = "".join(
+        f"i{level} = 0\nwhile (i{level} < 2) {{\ni{level} = i{level} + 1\n" if kind == "while" else
+        f"for (i{level} = 0; i{level} < 2; i{level} = i{level} + 1) {{\n"
+        for level in range(depth)
+    )
+    #skip() continues the innermost loop from the function it calls
+    body = "n = n + 1\nif (n == 1000) {\nreturn n\n}\nskip()\nn = 0\n"
+    return f"fun skip() {{\ncontinue\n}}\nfun count() {{\nn = 0\n{loops}{body}{'}' * depth}\n}}\nbuiltin_print(count())\n"
+
+
+class DeepNestingTest(unittest.TestCase):
+    def test_deeply_nested_loops_run_alike_on_every_backend(self):
+        #past 20 nested blocks CPython stops compiling, the python backend has to keep under that
+        for depth in (12, 30):
+            for kind in ("while", "for"):
+                for backend in BACKENDS:
+                    with self.subTest(depth=depth, kind=kind, backend=backend):
+                        output = io.StringIO()
+                        with redirect_stdout(output):
+                            run(nested_loops(depth, kind), backend)
+                        self.assertEqual(output.getvalue(), "1000\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
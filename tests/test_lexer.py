@@ -0,0 +1,53 @@
+import io
+import unittest
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+
+SOURCE = "a = 1\nb = 2 /* a comment\nover two lines */\n\n)\nc = 'x'\n"
+
+
+def locations(source, **options):
+    return [(tok.value, tok.location_metadata.line, tok.location_metadata.column) for tok in Lexer(source, **options).iter_tokens()]
+
+
+class StreamedLocationTest(unittest.TestCase):
+    def test_streamed_tokens_locate_like_in_memory_ones(self):
+        expected = locations(SOURCE)
+        for chunk_size in (1, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(locations(io.StringIO(SOURCE), chunk_size=chunk_size), expected)
+
+    def test_streamed_parse_errors_locate_like_in_memory_ones(self):
+        #the parser resolves locations while it is still pulling tokens out of the lexer
+        def messages(source):
+            _, diagnostics = Parser(Lexer(source).iter_tokens()).parse_all()
+            return [diagnostic.message for diagnostic in diagnostics]
+        expected = messages(SOURCE)
+        self.assertIn("line 5 col 1", expected[0])
+        self.assertEqual(messages(io.StringIO(SOURCE)), expected)
+
+
+class ScanCountingLexer(Lexer):
+    scanned = 0
+    def scan(self, buffer, endpos, final, start=0):
+        self.scanned += len(buffer)
+        return (yield from super().scan(buffer, endpos, final, start))
+
+
+class StreamedScanCostTest(unittest.TestCase):
+    def assertLinear(self, source):
+        lexer = ScanCountingLexer(io.StringIO(source), chunk_size=64)
+        self.assertEqual([(tok.type, tok.value, tok.offset) for tok in lexer.iter_tokens()],
+                         [(tok.type, tok.value, tok.offset) for tok in Lexer(source).iter_tokens()])
+        self.assertLessEqual(lexer.scanned, 2 * len(source))
+
+    def test_single_line_source_is_scanned_once(self):
+        self.assertLinear("abc = 12 " * 20000)
+
+    def test_long_block_comment_is_scanned_once(self):
+        self.assertLinear("a = 1\n/*" + " comment\n" * 20000 + "*/ b = 2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_main(*arguments):
+    return subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), *arguments], capture_output=True, text=True)
+
+def write(directory, name, source):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+class LazyFunctionTest(unittest.TestCase):
+    def test_syntax_errors_in_lazy_bodies_are_located(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = write(directory, "lazy.kyle", 'fun f(){\n    ( 1\n}\nbuiltin_print("before")\nf()\n')
+            #the first run parses the file, the second loads it from the cache
+            for run in ("parsed", "cached"):
+                with self.subTest(run=run):
+                    result = run_main("--lazy-functions", path)
+                    self.assertEqual(result.returncode, 1)
+                    self.assertIn("before", result.stdout)
+                    self.assertIn("at line 2 col 5", result.stdout)
+
+
+class JsonToStdoutTest(unittest.TestCase):
+    def test_stdout_is_only_the_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write(directory, "adult.kyle", 'age = 21\nif (age >= 18){\n    builtin_print("adult")\n}\n')
+            write(directory, "broken.kyle", "x = (\n")
+            for paths, expected in (([os.path.join(directory, "adult.kyle")], [True]), ([directory], [True, False])):
+                with self.subTest(paths=paths):
+                    result = run_main("--json", "-", *paths)
+                    self.assertEqual([record["ok"] for record in json.loads(result.stdout)], expected)
+                    self.assertIn("adult", result.stderr)
+
+
+
+class NoCacheTest(unittest.TestCase):
+    def test_no_cache_writes_nothing_next_to_the_sources(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write(directory, "one.kyle", "x = 1\n")
+            write(directory, "two.kyle", "y = 2\n")
+            for paths in ([os.path.join(directory, "one.kyle")], [directory]):
+                with self.subTest(paths=paths):
+                    self.assertEqual(run_main("--no-cache", *paths).returncode, 0)
+                    self.assertEqual(sorted(os.listdir(directory)), ["one.kyle", "two.kyle"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from type_decl.parser_types import AssignmentNode, ForNode, StringNode, SwitchNode
+
+
+def parser(source):
+    return Parser(Lexer(source).iter_tokens())
+
+
+class IterStatementsTest(unittest.TestCase):
+    def test_yields_every_top_level_statement(self):
+        statements = list(parser("a = 1\nbuiltin_print(a)\nb = 2\n").iter_statements())
+        self.assertEqual(len(statements), 3)
+
+    def test_unmatched_brace_is_an_error(self):
+        statements = parser("builtin_print(1)\n}\nbuiltin_print(2)\n").iter_statements()
+        next(statements)
+        with self.assertRaisesRegex(ValueError, "Unmatched '}'"):
+            next(statements)
+
+
+class AssignmentTest(unittest.TestCase):
+    def test_names_are_interned_and_literals_pooled(self):
+        program = parser("a = 'x'\nb = 'x'\na = b\n").parse()
+        first, second, third = program.Toplevel
+        self.assertIsInstance(first, AssignmentNode)
+        self.assertEqual(first.lhs, "a")
+        self.assertIs(first.lhs, third.lhs)
+        self.assertIsInstance(first.rhs, StringNode)
+        self.assertIs(first.rhs, second.rhs)
+
+
+
+class ForSwitchParseTest(unittest.TestCase):
+    def test_for_clauses(self):
+        loop, = parser("for (i = 0; i < 3; i = i + 1) {\n    builtin_print(i)\n}\n").parse().Toplevel
+        self.assertIsInstance(loop, ForNode)
+        self.assertEqual([stmt.lhs for stmt in loop.init + loop.increment], ["i", "i"])
+        self.assertEqual(loop.condition.right.value, 3)
+        self.assertEqual(len(loop.body), 1)
+
+    def test_switch_cases(self):
+        switch, = parser("switch (x) {\n    case 1\n        a = 1\n        b = 2\n    case 2\n    default\n        c = 3\n}\n").parse().Toplevel
+        self.assertIsInstance(switch, SwitchNode)
+        self.assertEqual([(case.value.value, len(case.body[0]) if case.body else 0) for case in switch.cases], [(1, 2), (2, 0)])
+        self.assertEqual(len(switch.default_case[0]), 1)
+
+if __name__ == "__main__":
+    unittest.main()
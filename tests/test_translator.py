@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from Semantics import PythonTranslator
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WrittenModuleTest(unittest.TestCase):
+    def test_written_modules_only_load_the_runtime(self):
+        program = Parser(Lexer("fun twice(n) {\n return n * 2\n}\nx = twice(21)\n").iter_tokens()).parse()
+        with tempfile.TemporaryDirectory() as directory:
+            PythonTranslator().write_module(program, os.path.join(directory, "twice.py"))
+            check = (
+                "import sys, twice\n"
+                "print(twice.run())\n"
+                "print(sorted(name for name in sys.modules if name.split('.')[0] in "
+                "('Semantics', 'lexer', 'parser', 'configurables', 'type_decl', 'util')))\n"
+            )
+            output = subprocess.run(
+                [sys.executable, "-c", check], capture_output=True, text=True, check=True,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join((directory, ROOT))},
+            ).stdout.splitlines()
+        self.assertEqual(output, ["[42]", "['Semantics', 'Semantics.runtime']"])
+
+
+class StreamTest(unittest.TestCase):
+    def statements(self, source):
+        return Parser(Lexer(source).iter_tokens()).iter_statements()
+
+    def test_stream_collects_what_interpret_returns(self):
+        source = "".join(f"x{i} = {i}\n" for i in range(100))
+        program = Parser(Lexer(source).iter_tokens()).parse()
+        self.assertEqual(PythonTranslator().interpret_stream(self.statements(source), collect=True), PythonTranslator().interpret(program))
+
+    def test_statements_before_a_syntax_error_still_run(self):
+        translator = PythonTranslator()
+        with self.assertRaises(ValueError):
+            translator.interpret_stream(self.statements("a = 1\nb = 2\nc = 3\nd = 4\ne = (\n"))
+        self.assertEqual([translator.environment[name] for name in "abcd"], [1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,6 @@
+import re
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass,field
 from enum import Enum
 
@@ -59,6 +62,7 @@ class TokenType(Enum):
     DEFAULT = "DEFAULT"
     IF = "IF"
     OTHERWISE = "OTHERWISE"
+    EOF = "EOF" #sentinel every token stream ends with
 
 
 CTOT_MAP = {
@@ -108,6 +112,11 @@ CTOT_MAP = {
 }
 
 
+#small int code per token type, what compact token buffers store instead of the Enum member
+TOKEN_TYPES = tuple(TokenType)
+TOKEN_CODES = {type: code for code, type in enumerate(TOKEN_TYPES)}
+
+
 RESERVED = [
     "if","otherwise","fun","while","for","return","goto","bailout","break","continue","switch","case","default"
 ]
@@ -121,12 +130,150 @@ class LocationMetadata:
     column:int
 
 
+class LineIndex:
+    """Offsets at which every line of a source starts.
+
+    Built once per source, and only the first time a location is actually
+    asked for; offsets are then turned into line/column by bisection.
+    Streamed sources that are never held whole get their line starts fed in
+    chunk by chunk instead.
+    """
+    NEWLINE = re.compile("\n")
+    BINARY_NEWLINE = re.compile(b"\n")
+    def __init__(self, source=None):
+        self.source = source
+        self.binary = source is not None and not isinstance(source, str)
+        self.starts = None if source is not None else array("I", [0])
+    def reset(self, source):
+        #the source was edited in place: forget the table, it gets rebuilt on the next lookup
+        self.source = source
+        self.binary = not isinstance(source, str)
+        self.starts = None
+    def build(self):
+        newline = self.BINARY_NEWLINE if self.binary else self.NEWLINE
+        self.starts = array("I", [0])
+        self.starts.extend(match.end() for match in newline.finditer(self.source))
+    def feed(self, text, base, end):
+        self.starts.extend(base + match.end() for match in self.NEWLINE.finditer(text, 0, end))
+    def locate(self, offset):
+        if self.starts is None:
+            self.build()
+        line = bisect_right(self.starts, offset)
+        start = self.starts[line - 1]
+        if self.binary:
+            #offsets into bytes sources count bytes, columns count characters
+            return LocationMetadata(line, len(str(self.source[start:offset], "utf-8", "replace")) + 1)
+        return LocationMetadata(line, offset - start + 1)
+
+
 @dataclass
 class Token:
     type: TokenType
     value: str
-    location_metadata : LocationMetadata =field(
-        default_factory=lambda: LocationMetadata(None, None)
-    ) #will store the column/lineno of this token in the original data , the kexer should provide these metadata for the parser
+    offset: int = field(default=None, compare=False) #where the lexeme starts in the source
+    lines: LineIndex = field(default=None, repr=False, compare=False)
+    @property
+    def location_metadata(self):
+        #line/column are resolved from the offset on demand, the lexer never tracks them
+        if self.lines is None or self.offset is None:
+            return LocationMetadata(None, None)
+        return self.lines.locate(self.offset)
+    def __repr__(self):
+        return f"Token({self.type}, '{self.value}')"
+
+
+@dataclass
+class Diagnostic:
+    """One problem found by a recovering lexer or parser, which report it and carry on instead of stopping"""
+    kind: str #"illegal symbol", "unterminated string", "unterminated comment" from the lexer, "value error", "type error", "run time" from the parser
+    message: str
+    offset: int = None #where in the source it was detected, Program.locate() turns it into line/column
+    expected: list = field(default_factory=list) #token types that would have been accepted there
+    def __str__(self):
+        return f"[{self.kind}] {self.message}"
+
+
+class TokenBuffer:
+    """Struct-of-arrays token storage: one byte of kind plus two offsets into the source per token.
+
+    Values are sliced (and decoded, for bytes sources) out of the source only
+    when a TokenView asks for them, so the buffer keeps the source alive.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.binary = not isinstance(source, str)
+        self.lines = LineIndex(source)
+        self.kinds = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+    def __len__(self):
+        return len(self.kinds)
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("TokenBuffer index out of range")
+        return TokenView(self, index)
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
+    def text(self, index):
+        text = self.source[self.starts[index]:self.ends[index]]
+        return str(text, "utf-8") if self.binary else text
+    def append_eof(self):
+        #zero-width EOF token at the end of the source, what every token stream ends with
+        self.kinds.append(TOKEN_CODES[TokenType.EOF])
+        self.starts.append(len(self.source))
+        self.ends.append(len(self.source))
+
+
+class CommentTable:
+    """Side table of the comments the lexer skipped, kept only as [start, end) offsets into the source"""
+    def __init__(self, source=None):
+        self.source = source #None for streamed sources, whose comments can then only be located, not read back
+        self.starts = array("I")
+        self.ends = array("I")
+    def add(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+    def __len__(self):
+        return len(self.starts)
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+    def text(self, index):
+        if self.source is None:
+            raise ValueError("The source of these comments was streamed, only their offsets were kept")
+        text = self.source[self.starts[index]:self.ends[index]]
+        return text if isinstance(text, str) else str(text, "utf-8")
+
+
+class TokenView:
+    """Token look-alike over one slot of a TokenBuffer, nothing is copied until asked for"""
+    __slots__ = ("buffer", "index")
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+    @property
+    def type(self):
+        return TOKEN_TYPES[self.buffer.kinds[self.index]]
+    @property
+    def offset(self):
+        return self.buffer.starts[self.index]
+    @property
+    def lines(self):
+        return self.buffer.lines
+    @property
+    def location_metadata(self):
+        return self.buffer.lines.locate(self.buffer.starts[self.index])
+    @property
+    def value(self):
+        text = self.buffer.text(self.index)
+        match TOKEN_TYPES[self.buffer.kinds[self.index]]:
+            case TokenType.STRING_LITERAL:
+                return text[1:-1]
+            case TokenType.INTEGER:
+                return int(text)
+            case _:
+                return text
     def __repr__(self):
         return f"Token({self.type}, '{self.value}')"
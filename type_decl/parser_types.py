@@ -1,101 +1,184 @@
-from dataclasses import dataclass
-from .lexer_types import TokenType
+from dataclasses import dataclass, field
+from .lexer_types import TokenType, LineIndex, LocationMetadata, CTOT_MAP
 
-@dataclass 
+#statement nodes carry the source offset of their first token; line/column come from ProgramNode.locate()
+#every node is slotted: no per-instance __dict__, programs hold millions of them
+
+#operator nodes keep the TokenType of their operator, this is only for printing them back
+OPERATOR_SYMBOLS = {type: symbol for symbol, type in CTOT_MAP.items()}
+
+@dataclass(slots=True)
 class ProgramNode:
     Toplevel :any
-
-@dataclass
+    lines: LineIndex = field(default=None, repr=False, compare=False)
+    constants: "ConstantPool" = field(default=None, repr=False, compare=False) #every distinct literal of the program, see ConstantPool
+    def locate(self, node):
+        """Resolve a node's offset to a LocationMetadata, only done when something needs to report it"""
+        if self.lines is None or getattr(node, "offset", None) is None:
+            return LocationMetadata(None, None)
+        return self.lines.locate(node.offset)
+
+@dataclass(slots=True)
 class FunctionNode:
     name: str
     params: list
-    body: list
+    body: list #None while a lazy parser's DeferredBody is still pending
     return_type: TokenType = None
-
-@dataclass
+    offset: int = None
+    deferred: "DeferredBody" = field(default=None, repr=False, compare=False)
+
+@dataclass(slots=True)
+class DeferredBody:
+    """The tokens of a lazily parsed function body, parsed when the function is first called"""
+    parser: type #the Parser (sub)class that skipped it
+    tokens: any #the body's own tokens, from `start` up to and including its closing '}'
+    start: int
+    constants: "ConstantPool" = None
+    def parse(self):
+        parser = self.parser(self.tokens, constants=self.constants, lazy_functions=True)
+        parser.token_stream.cursor = self.start
+        run = parser.start_descent_recursion()
+        return [run] if run else []
+
+@dataclass(slots=True)
 class IfNode:
     condition: any
     then_branch: any
     else_branch: any = None
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class WhileNode:
     condition: any
     body: any
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class ForNode:
     init: any
     condition: any
     increment: any
     body: any
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class ReturnNode:
     value: any = None
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class GotoNode:
     label: str
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class BreakNode:
-    pass
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class ContinueNode:
-    pass
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class SwitchNode:
     expression: any
     cases: list
     default_case: any = None
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class CaseNode:
     value: any
     body: any
+    offset: int = None
 
-@dataclass
+@dataclass(slots=True)
 class FunctionCallNode:
     name: str
     args: list
+    offset: int = None
+
+@dataclass(slots=True)
+class BinaryOpNode:
+    op: TokenType
+    left: any
+    right: any
+    offset: int = None
+    def __repr__(self):
+        return f"BinaryOpNode({self.left!r} {OPERATOR_SYMBOLS[self.op]} {self.right!r})"
+
+@dataclass(slots=True)
+class CompareNode:
+    op: TokenType
+    left: any
+    right: any
+    offset: int = None
+    def __repr__(self):
+        return f"CompareNode({self.left!r} {OPERATOR_SYMBOLS[self.op]} {self.right!r})"
+
+@dataclass(slots=True)
+class UnaryOpNode:
+    op: TokenType
+    operand: any
+    offset: int = None
+    def __repr__(self):
+        return f"UnaryOpNode({OPERATOR_SYMBOLS[self.op]}{self.operand!r})"
 
-@dataclass
+#literal nodes are immutable, the parser hands out one shared node per distinct constant
+@dataclass(slots=True, frozen=True)
 class IntegerNode:
     value : int
     type : TokenType = TokenType.INTEGER
     def __repr__(self):
         return f"IntegerNode(value='{self.value}')"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FloatNode:
     value : float
     type : TokenType = TokenType.FLOAT_LITERAL
     def __repr__(self):
         return f"FloatNode(value='{self.value}')"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class StringNode:
     value : str
     type : TokenType = TokenType.STRING_LITERAL
     def __repr__(self):
         return f"StringNode(value='{self.value}')"
 
+LITERAL_NODES = {TokenType.INTEGER: IntegerNode, TokenType.FLOAT_LITERAL: FloatNode, TokenType.STRING_LITERAL: StringNode}
+
+class ConstantPool:
+    """Per-program table of distinct literals and identifier names.
+
+    Equal constants share one literal node, numbered by first appearance so
+    later stages can refer to a constant by its slot in `constants`.
+    """
+    def __init__(self):
+        self.constants = [] #slot -> literal node
+        self.slots = {} #(TokenType, value) -> slot
+        self.names = {} #identifier name -> the one string object every node uses for it
+    def literal(self, type, value):
+        key = (type, value)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.slots[key] = len(self.constants)
+            self.constants.append(LITERAL_NODES[type](value))
+        return self.constants[slot]
+    def slot(self, node):
+        return self.slots[(node.type, node.value)]
+    def name(self, name):
+        return self.names.setdefault(name, name)
+    def clear(self):
+        #nodes handed out stay valid, later constants just stop being shared with them
+        self.constants, self.slots, self.names = [], {}, {}
+    def __len__(self):
+        return len(self.constants)
+
+@dataclass(slots=True)
 class AssignmentNode:
-    def __init__(self, lvalue, lvalue_type, rvalue, rvalue_type):
-        self.lhs = lvalue
-        self.rhs = rvalue
-        self.enforce_type(lvalue_type, rvalue_type)
-    def enforce_type(self, lhs_type, rhs_type):
-        if lhs_type != rhs_type and lhs_type != TokenType.IDENTIFIER:#IDENTIFIER is the required lvalue that will hold the mem address in the heap for the assigned rhs
-            raise TypeError(
-                f"Can't assign value from type '{rhs_type}'"
-                f"to an identifier of type {lhs_type}"
-            )
-        else:pass
-    def process(self):
-        pass
+    lhs: str #the interned name assigned to, no token is kept alive by the tree
+    rhs: any
+    offset: int = None
     def __repr__(self):
-        return f"AssignmentNode(lhs='{repr(self.lhs)}',rhs={repr(self.rhs)})"
\ No newline at end of file
+        return f"AssignmentNode(lhs='{self.lhs}',rhs={repr(self.rhs)})"
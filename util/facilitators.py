@@ -1,3 +1,7 @@
+from collections import deque
+from type_decl.lexer_types import LocationMetadata, TokenType
+
+
 class AssignmentNode:
     def __init__(self, lvalue, lvalue_type, rvalue, rvalue_type):
         self.lhs = lvalue
@@ -18,31 +22,31 @@ class AssignmentNode:
 
 
 class StreamIterator:
-    def __init__(self, data: str, label: str = "In Memory Str Object"):
+    def __init__(self, data: str, label: str = "In Memory Str Object", sentinel: bool = False):
         self.data = data
         self.label = label
+        #with a sentinel the data ends with an item (the EOF token) the stream parks on instead of running off the end:
+        #has_next() turns False once it is current, and next()/peek() past the end return it instead of raising
+        self.sentinel = sentinel
+        self.end = len(data) - 1 if sentinel else len(data)
         self.cursor = 0
-        self.line_no = 1
-        self.column_no = 1
 
     def peek(self, step=1):
         target = self.cursor + step
-        if 0 <= target < len(self.data):
+        if 0 <= target < self.end:
             return self.data[target]
+        if self.sentinel and target >= 0:
+            return self.data[self.end]
         raise StopIteration("Peek out of bounds")
 
     def next(self):
-        if not self.has_next():
+        if self.cursor >= self.end:
+            if self.sentinel:
+                return self.data[self.end]
             raise StopIteration
         
         char = self.data[self.cursor]
         self.cursor += 1
-
-        if char == "\n":
-            self.line_no += 1
-            self.column_no = 1
-        else:
-            self.column_no += 1
         return char
 
     def undo(self):
@@ -50,24 +54,17 @@ class StreamIterator:
             raise ValueError("Start of stream")
         
         self.cursor -= 1
-        char = self.data[self.cursor]
-
-        if char == "\n":
-            self.line_no -= 1
-            prev_nl = self.data.rfind('\n', 0, self.cursor)
-            self.column_no = self.cursor - prev_nl
-        else:
-            self.column_no -= 1
-        return char
+        return self.data[self.cursor]
 
     def has_next(self):
-        return self.cursor < len(self.data)
+        return self.cursor < self.end
 
     def current(self):
-        return self.data[self.cursor] if self.has_next() else None
+        #a parked stream sits on its sentinel, so this is never None for it
+        return self.data[self.cursor] if self.cursor < self.end + self.sentinel else None
 
     def reset(self):
-        self.__init__(self.data, self.label)
+        self.__init__(self.data, self.label, self.sentinel)
     def peek_back(self,n=1):
         if n<1:
             raise ValueError("Dude are you dumb? what the hell does 'Negative History Resolution' Even Mean ?")
@@ -75,6 +72,102 @@ class StreamIterator:
             return self.data[self.cursor - n]
         raise StopIteration("Damn! Seems-like I cant ' peek_back ' {} steps : the best i can do rn is ' peek_back ' {} steps".format(n,self.cursor))
 
+    @property
+    def line_no(self):
+        #worked out on demand instead of being tracked on every next()
+        location = self.location()
+        return location.line if location else 1
+
+    @property
+    def column_no(self):
+        location = self.location()
+        return location.column if location else self.cursor + 1
+
+    def location(self):
+        if isinstance(self.data, str):
+            return LocationMetadata(
+                self.data.count("\n", 0, self.cursor) + 1,
+                self.cursor - self.data.rfind("\n", 0, self.cursor)
+            )
+        item = self.current()
+        return item.location_metadata if getattr(item, "offset", None) is not None else None
+
     def return_formatted_state(self):
         char = self.current() or "EOF"
-        return f'"{repr(char)}" at line {self.line_no} col {self.column_no} in "{self.label}"'
\ No newline at end of file
+        return f'"{repr(char)}" at line {self.line_no} col {self.column_no} in "{self.label}"'
+
+
+class LookaheadStream:
+    """StreamIterator look-alike over a lazy iterator.
+
+    Only a small ring buffer of `behind` consumed items, the current item and
+    `ahead` peekable items is ever held, so memory stays flat however long
+    the underlying iterator runs.
+    """
+    def __init__(self, source, label: str = "Lazy Token Stream", behind: int = 2, ahead: int = 1, sentinel: bool = False):
+        self.source = iter(source)
+        self.label = label
+        self.sentinel = sentinel #the last item of the source is a sentinel to park on, as in StreamIterator
+        self.behind = behind
+        self.ahead = ahead
+        self.window = deque(maxlen=behind + 1 + ahead)
+        self.base = 0 #absolute index of window[0]
+        self.cursor = 0 #absolute index of the current item
+        self.exhausted = False
+
+    def fill(self, target):
+        while not self.exhausted and self.base + len(self.window) <= target:
+            try:
+                item = next(self.source)
+            except StopIteration:
+                self.exhausted = True
+                break
+            if len(self.window) == self.window.maxlen:
+                self.base += 1
+            self.window.append(item)
+
+    def peek(self, step=1):
+        if step > self.ahead:
+            raise ValueError(f"Can only peek {self.ahead} step(s) ahead in \"{self.label}\"")
+        target = self.cursor + step
+        self.fill(target)
+        if 0 <= target and self.base <= target < self.base + len(self.window):
+            return self.window[target - self.base]
+        if self.sentinel and self.exhausted and self.window:
+            return self.window[-1]
+        raise StopIteration("Peek out of bounds")
+
+    def next(self):
+        if not self.has_next():
+            if self.sentinel:
+                return self.current()
+            raise StopIteration
+        item = self.window[self.cursor - self.base]
+        self.cursor += 1
+        return item
+
+    def has_next(self):
+        #with a sentinel there is a next item only if something follows the current one
+        target = self.cursor + self.sentinel
+        self.fill(target)
+        return target < self.base + len(self.window)
+
+    def current(self):
+        self.fill(self.cursor)
+        return self.window[self.cursor - self.base] if self.cursor < self.base + len(self.window) else None
+
+    def peek_back(self,n=1):
+        if n<1:
+            raise ValueError("Dude are you dumb? what the hell does 'Negative History Resolution' Even Mean ?")
+        if n > self.behind:
+            raise ValueError(f"Can only peek_back {self.behind} step(s) in \"{self.label}\"")
+        if self.cursor >= n:
+            return self.window[self.cursor - n - self.base]
+        raise StopIteration("Damn! Seems-like I cant ' peek_back ' {} steps : the best i can do rn is ' peek_back ' {} steps".format(n,self.cursor))
+
+    def return_formatted_state(self):
+        item = self.current() or "EOF"
+        if getattr(item, "offset", None) is not None:
+            location = item.location_metadata
+            return f'"{repr(item)}" at line {location.line} col {location.column} in "{self.label}"'
+        return f'"{repr(item)}" at item {self.cursor} in "{self.label}"'
@@ -1,6 +1,9 @@
+import os
 import sys
+import mmap
 import colorama
 import re
+from contextlib import contextmanager
 colorama.init(autoreset=True)
 
 
@@ -27,4 +30,13 @@ def fmt_c(msg,color="white"):
         "white":colorama.Fore.WHITE
     }
     return f"{color_map.get(color.lower(),color_map["white"])}{msg}{color_map["white"]}"
-    
\ No newline at end of file
+
+@contextmanager
+def mapped_source(filename):
+    """Map a source file read-only so the lexer scans the page cache directly instead of a heap copy"""
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b"" #empty files can't be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            yield source
@@ -0,0 +1,131 @@
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import fields, is_dataclass
+from type_decl.lexer_types import Token
+
+
+def ast_size(program):
+    """Count the distinct AST nodes of a program and the bytes its tree holds.
+
+    Everything reachable from the top-level statements is counted once, so
+    nodes, names and values shared through the constant pool are not
+    charged twice. Tokens kept in the tree are charged but not walked.
+    """
+    seen, nodes, size = set(), 0, 0
+    stack = [program.Toplevel or []]
+    while stack:
+        node = stack.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        size += sys.getsizeof(node)
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Token):
+            size += sys.getsizeof(node.__dict__) if hasattr(node, "__dict__") else 0
+        elif is_dataclass(node):
+            nodes += 1
+            #slotted nodes have no instance dict, the others pay for one on top
+            size += sys.getsizeof(node.__dict__) if hasattr(node, "__dict__") else 0
+            stack.extend(getattr(node, f.name) for f in fields(node))
+    return {"nodes": nodes, "bytes": size, "bytes_per_node": size / nodes if nodes else 0}
+
+
+class PhaseMetrics:
+    """Wall time, CPU time and (with `memory`) the traced allocation peak of every pipeline phase, plus counters.
+
+    Only built when a run asks for it (main.py --timings / --mem); the plain
+    pipeline never touches it, so it costs nothing when disabled.
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = {} #phase name -> measurements, in the order the phases ran
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name):
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu}
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                #relative to what was live when the phase started: what the phase itself allocated
+                record["peak_bytes"] = peak - before
+                record["retained_bytes"] = current - before
+            self.phases[name] = record
+
+    def count_statements(self, interpreter):
+        """Make this one interpreter count the statements it executes (statement lists are not counted)"""
+        self.counts["statements"] = 0
+        if hasattr(interpreter, "on_statement"):
+            #translated programs (Semantics.translator) call the hook before every statement instead
+            def counted():
+                self.counts["statements"] += 1
+            interpreter.on_statement = counted
+            return
+        if hasattr(interpreter, "compile_statement"):
+            #compiling backends (Semantics.closures) get a counter wrapped around every statement's closure instead
+            compile_statement = interpreter.compile_statement
+            def counting_compile(stmt, results=True):
+                run = compile_statement(stmt, results)
+                if isinstance(stmt, list):
+                    return run
+                def counted():
+                    self.counts["statements"] += 1
+                    return run()
+                return counted
+            interpreter.compile_statement = counting_compile
+            return
+        #bodies dispatch their statements straight from statement_dispatch, the counter goes around every handler
+        def counting(handler):
+            def counted(interpreter, stmt):
+                self.counts["statements"] += 1
+                return handler(interpreter, stmt)
+            return counted
+        interpreter.statement_dispatch = {
+            type: handler if type is list else counting(handler) for type, handler in interpreter.statement_dispatch.items()
+        }
+
+    def count_nodes(self, program):
+        size = ast_size(program)
+        self.counts["nodes"] = size["nodes"]
+        if self.memory:
+            self.counts["ast_bytes"] = size["bytes"]
+
+    def close(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def as_dict(self):
+        return {"phases": self.phases, "counts": self.counts}
+
+    def format(self):
+        lines = []
+        for name, record in self.phases.items():
+            line = f"{name:>10}  wall {record['wall_seconds'] * 1000:10.2f}ms  cpu {record['cpu_seconds'] * 1000:10.2f}ms"
+            if "peak_bytes" in record:
+                line += f"  peak {record['peak_bytes'] / (1 << 20):8.2f}MB  retained {record['retained_bytes'] / (1 << 20):8.2f}MB"
+            lines.append(line)
+        lines.append("    counts  " + "  ".join(f"{name} {count}" for name, count in self.counts.items()))
+        return "\n".join(lines)
+
+
+def write_json(records, path):
+    """Dump metric records as JSON to `path`, or to stdout for '-'"""
+    if path == "-":
+        json.dump(records, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w") as f:
+        json.dump(records, f, indent=2)
+        f.write("\n")